@@ -1,6 +1,14 @@
 from fastapi import APIRouter
 
-from apis.v1 import route_auth, route_home, route_users, route_tweets
+from apis.v1 import (
+    route_auth,
+    route_exports,
+    route_home,
+    route_metrics,
+    route_profiler,
+    route_users,
+    route_tweets,
+)
 
 
 api_router = APIRouter(prefix="/api/v1")
@@ -8,3 +16,6 @@ api_router.include_router(route_auth.router, prefix="/auth", tags=["Auth"])
 api_router.include_router(route_home.router, prefix="/home", tags=["Home"])
 api_router.include_router(route_users.router, prefix="/users", tags=["Users"])
 api_router.include_router(route_tweets.router, prefix="/tweets", tags=["Tweets"])
+api_router.include_router(route_metrics.router, prefix="/metrics", tags=["Metrics"])
+api_router.include_router(route_exports.router, prefix="/exports", tags=["Exports"])
+api_router.include_router(route_profiler.router, prefix="/profiler", tags=["Profiler"])
@@ -0,0 +1,126 @@
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from core.config import settings
+from core.pagination import decode_cursor, encode_cursor
+from schemas.bulk import BulkStatus
+from schemas.users import shape_user
+
+
+def async_variant(async_handler):
+    """
+    Register `async_handler` instead of the decorated read path operation
+    when the async database layer is enabled for reads (ASYNC_DB_READS=true).
+    """
+
+    def decorator(sync_handler):
+        if not settings.ASYNC_DB_READS:
+            return sync_handler
+        async_handler.__doc__ = sync_handler.__doc__
+        return async_handler
+
+    return decorator
+
+
+def bulk_result(ids, existing, changed, invalid=()):
+    changed = set(changed)
+    results = []
+    for item_id in dict.fromkeys(ids):
+        if item_id in invalid:
+            status = BulkStatus.invalid
+        elif item_id not in existing:
+            status = BulkStatus.not_found
+        elif item_id in changed:
+            status = BulkStatus.created
+        else:
+            status = BulkStatus.unchanged
+        results.append({"id": item_id, "status": status})
+    return {"results": results}
+
+
+def parse_cursor(before: Optional[str]):
+    try:
+        return decode_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(response: Response, items: list, limit: int):
+    if len(items) == limit:
+        last = items[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
+
+def serialize(schema, obj):
+    """JSON-ready dict of an ORM object through a response schema."""
+    if hasattr(schema, "model_validate"):
+        return jsonable_encoder(schema.model_validate(obj, from_attributes=True))
+    return jsonable_encoder(schema.from_orm(obj))
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(it) for it in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def check_not_modified(
+    request: Request, response: Response, etag: str
+) -> Optional[Response]:
+    """
+    Set the ETag of `response` and return a 304 response when If-None-Match
+    still matches. There is no Last-Modified: likes and follows change the
+    payloads without a timestamp to show for it.
+    """
+    response.headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    tags = [it.strip() for it in if_none_match.split(",")]
+    if "*" not in tags and etag not in tags:
+        return None
+    return Response(status_code=304, headers=dict(response.headers))
+
+
+def author_fields(user: dict) -> str:
+    return json.dumps(user, sort_keys=True, default=str)
+
+
+def tweet_etag(payload: dict) -> str:
+    return make_etag(
+        payload["id"],
+        payload["updated_at"],
+        payload["likes_count"],
+        author_fields(payload["user"]),
+    )
+
+
+def user_etag(payload: dict) -> str:
+    return make_etag(json.dumps(payload, sort_keys=True))
+
+
+def timeline_etag(tweets: list, *cursor) -> str:
+    """ETag of a page of tweets and the cursor that selected it."""
+    return make_etag(
+        *cursor,
+        *(
+            (it.id, it.updated_at, it.likes_count, author_fields(shape_user(it.user)))
+            for it in tweets
+        ),
+    )
+
+
+def list_response(response: Response, items: list, shape):
+    """
+    Return `items` for response_model validation, or with FAST_JSON_RESPONSES
+    an ORJSONResponse of the shaped dicts carrying the headers already set.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return items
+    return ORJSONResponse(
+        content=[shape(it) for it in items], headers=dict(response.headers)
+    )
@@ -1,20 +1,34 @@
 from datetime import timedelta
 
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.security.utils import get_authorization_scheme_param
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from starlette import status
 
 
 from core.config import settings
-from core.hashing import Hasher
-from core.security import create_access_token
-from db.repository.users import get_user_by_email, create_new_user
+from core.hashing import Hasher, HasherBusy
+from core.metrics import jwt_decode_failures
+from core.security import create_access_token, decode_access_token
+from db.repository.users import (
+    create_new_user,
+    get_principal,
+    get_principal_from_claims,
+    get_user_by_email,
+    update_password_hash,
+)
+from db.repository.tokens import (
+    create_refresh_token,
+    revocations,
+    rotate_refresh_token,
+)
+from db.repository.tweets import likes_queue
 from db.session import get_db
 from schemas.mixins import Detail
-from schemas.tokens import Token
+from schemas.tokens import RefreshRequest, Token
 from schemas.users import User, UserRegister
-from jose import JWTError, jwt
+from jose import ExpiredSignatureError, JWTError
 
 
 router = APIRouter()
@@ -24,17 +38,40 @@ def authenticate_user(email: str, password: str, db: Session):
     user = get_user_by_email(db=db, email=email)
     if not user:
         return None
-    if not Hasher.verify_password(password, user.hashed_password):
+    valid, new_hash = Hasher.verify_and_update(password, user.hashed_password)
+    # checked after the hash so an inactive account answers as slowly
+    if not valid or not user.is_active:
         return None
+    if new_hash:
+        update_password_hash(db, user, new_hash)
     return user
 
 
+def issue_tokens(db: Session, user, refresh_token: str = None):
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires, user=user
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token or create_refresh_token(db, user),
+    }
+
+
+def hasher_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, try again later",
+    )
+
+
 @router.post(
     path="/signup",
     response_model=User,
     status_code=status.HTTP_201_CREATED,
     summary="Register a user",
-    responses={400: {"model": Detail}},
+    responses={400: {"model": Detail}, 429: {"model": Detail}},
 )
 def signup(user: UserRegister = Body(...), db: Session = Depends(get_db)):
     """
@@ -55,7 +92,10 @@ def signup(user: UserRegister = Body(...), db: Session = Depends(get_db)):
     exists = get_user_by_email(db, user.email)
     if exists:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user_result = create_new_user(user, db)
+    try:
+        user_result = create_new_user(user, db)
+    except HasherBusy:
+        raise hasher_busy_exception()
     return user_result
 
 
@@ -64,22 +104,51 @@ def signup(user: UserRegister = Body(...), db: Session = Depends(get_db)):
     response_model=Token,
     status_code=status.HTTP_200_OK,
     summary="Login a user",
-    responses={401: {"model": Detail}},
+    responses={401: {"model": Detail}, 429: {"model": Detail}},
 )
 def login(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    try:
+        user = authenticate_user(form_data.username, form_data.password, db)
+    except HasherBusy:
+        raise hasher_busy_exception()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(db, user)
+
+
+@router.post(
+    path="/refresh",
+    response_model=Token,
+    status_code=status.HTTP_200_OK,
+    summary="Refresh the access token",
+    responses={401: {"model": Detail}},
+)
+def refresh(body: RefreshRequest = Body(...), db: Session = Depends(get_db)):
+    """
+    Refresh
+
+    This path operation exchange a refresh token for a new access token and
+    a new refresh token, without checking the password again. Each refresh
+    token works once; reusing one revokes every token rotated from it.
+
+    Parameters:
+        - Request body parameter
+            - refresh_token: str
+    Return a json with the access_token, the refresh_token and the token_type
+    """
+    rotated = rotate_refresh_token(db, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
+    user, refresh_token = rotated
+    return issue_tokens(db, user, refresh_token)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
@@ -93,15 +162,42 @@ def get_current_user_from_token(
         detail="Could not validate credentials",
     )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
+            jwt_decode_failures.inc("missing_subject")
             raise credentials_exception
+    except ExpiredSignatureError:
+        jwt_decode_failures.inc("expired")
+        raise credentials_exception
     except JWTError:
+        jwt_decode_failures.inc("invalid")
         raise credentials_exception
-    user = get_user_by_email(email=username, db=db)
+    if revocations.is_revoked(db, username, payload.get("iat", 0)):
+        jwt_decode_failures.inc("revoked")
+        raise credentials_exception
+    if settings.JWT_STATELESS_PRINCIPAL and "user_id" in payload:
+        return get_principal_from_claims(db, payload)
+    user = get_principal(email=username, db=db)
     if user is None:
+        jwt_decode_failures.inc("unknown_user")
         raise credentials_exception
     return user
+
+
+def wait_for_own_likes(request: Request):
+    """
+    With LIKES_WRITE_BEHIND, make a read see the likes its user queued: wait
+    until they are written when the request carries a valid token.
+    """
+    if not likes_queue.has_pending():
+        return
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer" or not token:
+        return
+    try:
+        subject = decode_access_token(token).get("sub")
+    except JWTError:
+        return
+    if subject:
+        likes_queue.wait_for(subject.lower())
@@ -0,0 +1,71 @@
+from enum import Enum
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette import status
+
+from apis.v1.route_auth import get_current_user_from_token
+from db.models.users import User
+from db.repository.exports import stream_export
+from schemas.mixins import Detail
+
+router = APIRouter()
+
+
+class Dataset(str, Enum):
+    users = "users"
+    tweets = "tweets"
+    likes = "likes"
+    follows = "follows"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+@router.get(
+    path="/{dataset}",
+    status_code=status.HTTP_200_OK,
+    summary="Export a dataset",
+    responses={403: {"model": Detail}},
+)
+def export_dataset(
+    dataset: Dataset,
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    gzip: bool = Query(False),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    """
+    Export a dataset
+
+    This path operation stream every row of users, tweets, likes or follows
+    with a server side cursor, so memory stays flat whatever the table size.
+    Only superusers are allowed.
+
+    Parameters:
+        - Path parameter
+            - dataset: users, tweets, likes or follows
+        - Query parameters
+            - format: ndjson or csv
+            - gzip: bool, download a gzip file compressed on the fly
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="You are not authorized")
+
+    # a .gz file, not a Content-Encoding clients would undo on the fly
+    extension = format.value + (".gz" if gzip else "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{dataset.value}.{extension}"'
+    }
+    return StreamingResponse(
+        stream_export(dataset.value, format.value, gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers=headers,
+    )
@@ -1,20 +1,111 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
-from typing import List
 
-from db.repository.tweets import get_all_tweets
-from db.session import get_db
-from schemas.tweets import Tweet
+from apis.utils import (
+    async_variant,
+    check_not_modified,
+    list_response,
+    parse_cursor,
+    set_next_cursor,
+    timeline_etag,
+)
+from apis.v1.route_auth import get_current_user_from_token, wait_for_own_likes
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from db.models.users import User
+from db.repository.timelines import get_following_timeline
+from db.repository import async_tweets
+from db.repository.tweets import get_timeline_tweets
+from db.session import get_async_db, get_db
+from schemas.mixins import Detail
+from schemas.tweets import Tweet, shape_tweet
 
 router = APIRouter()
 
 
+def timeline_response(
+    request: Request, response: Response, tweets: list, limit: int, before
+):
+    set_next_cursor(response, tweets, limit)
+    etag = timeline_etag(tweets, limit, before)
+    not_modified = check_not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    return list_response(response, tweets, shape_tweet)
+
+
+async def home_async(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    tweets = await async_tweets.get_timeline_tweets(db, limit, parse_cursor(before))
+    return timeline_response(request, response, tweets, limit, before)
+
+
 @router.get(
     path="",
     response_model=List[Tweet],
     status_code=status.HTTP_200_OK,
     summary="Show all tweets",
+    responses={400: {"model": Detail}},
+    dependencies=[Depends(wait_for_own_likes)],
+)
+@async_variant(home_async)
+def home(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Home
+
+    This path operation show the active tweets, newest first
+
+    Parameters:
+        - Query parameters
+            - limit: int
+            - before: str, the cursor returned in the X-Next-Cursor header
+    Return a json list with the tweets of the page
+    """
+    tweets = get_timeline_tweets(db, limit, parse_cursor(before))
+    return timeline_response(request, response, tweets, limit, before)
+
+
+@router.get(
+    path="/following",
+    response_model=List[Tweet],
+    status_code=status.HTTP_200_OK,
+    summary="Show tweets of followed users",
+    responses={400: {"model": Detail}},
+    dependencies=[Depends(wait_for_own_likes)],
 )
-def home(db: Session = Depends(get_db)):
-    return get_all_tweets(db)
+def home_following(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    """
+    Following feed
+
+    This path operation show the active tweets of the current user and the
+    users they follow, newest first
+
+    Parameters:
+        - Query parameters
+            - limit: int
+            - before: str, the cursor returned in the X-Next-Cursor header
+    Return a json list with the tweets of the page
+    """
+    tweets = get_following_timeline(db, current_user, limit, parse_cursor(before))
+    return timeline_response(request, response, tweets, limit, before)
@@ -0,0 +1,134 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette import status
+
+from core.cache import TTLCache, response_cache
+from core.metrics import Counter, Gauge, registry
+from db.pool import pool_stats
+from db.repository.tweets import likes_queue
+from db.repository.users import principal_cache
+from db.session import async_engine, engine
+
+router = APIRouter()
+
+pool_gauges = {
+    key: registry.register(Gauge(f"db_pool_{key}", description, ("engine",)))
+    for key, description in (
+        ("pool_size", "Connections the pool keeps open"),
+        ("checked_in", "Idle connections in the pool"),
+        ("checked_out", "Connections in use"),
+        ("overflow", "Connections opened over pool_size"),
+    )
+}
+pool_checkouts = registry.register(
+    Counter("db_pool_checkouts_total", "Connection checkouts", ("engine",))
+)
+pool_wait = registry.register(
+    Counter(
+        "db_pool_checkout_wait_seconds_total",
+        "Time spent waiting for a connection",
+        ("engine",),
+    )
+)
+cache_gauges = {
+    key: registry.register(Gauge(f"cache_{key}", description, ("cache",)))
+    for key, description in (
+        ("size", "Entries in the cache"),
+        ("hits", "Cache hits since start"),
+        ("misses", "Cache misses since start"),
+    )
+}
+
+write_behind_pending = registry.register(
+    Gauge("write_behind_pending", "Writes queued and not applied yet", ("queue",))
+)
+write_behind_flushed = registry.register(
+    Counter("write_behind_flushed_total", "Queued writes applied", ("queue",))
+)
+write_behind_failures = registry.register(
+    Counter("write_behind_failures_total", "Batches that failed to apply", ("queue",))
+)
+write_behind_dropped = registry.register(
+    Counter(
+        "write_behind_dropped_total",
+        "Queued writes dropped after their last attempt",
+        ("queue",),
+    )
+)
+
+
+@registry.collector
+def collect_pools():
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.pool
+    for name, pool in pools.items():
+        stats = pool_stats(pool)
+        for key, gauge in pool_gauges.items():
+            if key in stats:
+                gauge.set(name, value=stats[key])
+        if "checkouts" in stats:
+            pool_checkouts.set(name, value=stats["checkouts"])
+            pool_wait.set(name, value=stats["wait_seconds_total"])
+
+
+@registry.collector
+def collect_caches():
+    caches = {"principal": principal_cache}
+    if isinstance(response_cache.backend, TTLCache):
+        caches["response"] = response_cache.backend
+    for name, cache in caches.items():
+        for key, value in cache.stats().items():
+            cache_gauges[key].set(name, value=value)
+
+
+@registry.collector
+def collect_write_behind():
+    stats = likes_queue.stats()
+    write_behind_pending.set("likes", value=stats["pending"])
+    write_behind_flushed.set("likes", value=stats["flushed"])
+    write_behind_failures.set("likes", value=stats["failures"])
+    write_behind_dropped.set("likes", value=stats["dropped"])
+
+
+@router.get(
+    path="",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Show metrics in the Prometheus text format",
+)
+def metrics():
+    """
+    Metrics
+
+    This path operation show the metrics in the Prometheus text exposition
+    format: request latency histograms by route template, requests in
+    progress, database pool and cache gauges, bcrypt durations, JWT decode
+    failures and the write-behind queue of likes
+
+    Return the metrics as text/plain
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get(
+    path="/db-pool",
+    status_code=status.HTTP_200_OK,
+    summary="Show database pool metrics",
+)
+def db_pool():
+    """
+    Database pool metrics
+
+    This path operation show the state of the connection pools
+
+    Return a json with, for each engine:
+        - pool: str, the pool class
+        - pool_size, checked_in, checked_out, overflow: int
+        - checkouts: int and wait_seconds_total/max/avg: float, the time spent
+          waiting for a connection (sync engine only)
+    """
+    pools = {"sync": pool_stats(engine.pool)}
+    if async_engine is not None:
+        pools["async"] = pool_stats(async_engine.pool)
+    return pools
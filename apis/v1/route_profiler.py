@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette import status
+
+from apis.v1.route_auth import get_current_user_from_token
+from core.config import settings
+from core.profiler import profiler
+from db.models.users import User
+from schemas.mixins import Detail
+from schemas.profiler import ProfilerState, ProfilerUpdate
+
+router = APIRouter()
+
+
+def check_admin(current_user: User):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="You are not authorized")
+    if not settings.PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+
+
+def profiler_state():
+    return {
+        "sample_rate": profiler.sample_rate,
+        "next_requests": profiler.next_requests,
+        "files": profiler.files(),
+    }
+
+
+@router.get(
+    path="",
+    response_model=ProfilerState,
+    status_code=status.HTTP_200_OK,
+    summary="Show the profiler state",
+    responses={403: {"model": Detail}, 404: {"model": Detail}},
+)
+def show_profiler(current_user: User = Depends(get_current_user_from_token)):
+    """
+    Profiler state
+
+    This path operation show the profiler sample rate, the number of coming
+    requests it will profile and the profiles written. Only superusers are
+    allowed.
+
+    Return a json with:
+        - sample_rate: float
+        - next_requests: int
+        - files: list of profile file names, oldest first
+    """
+    check_admin(current_user)
+    return profiler_state()
+
+
+@router.put(
+    path="",
+    response_model=ProfilerState,
+    status_code=status.HTTP_200_OK,
+    summary="Change the profiler state",
+    responses={403: {"model": Detail}, 404: {"model": Detail}},
+)
+def update_profiler(
+    state: ProfilerUpdate = Body(...),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    """
+    Update the profiler
+
+    This path operation change the share of requests the profiler samples or
+    ask it to profile the next requests, until the process restarts. Only
+    superusers are allowed.
+
+    Parameters:
+        - Request body parameter
+            - sample_rate: float between 0 and 1
+            - next_requests: int, profile this many coming requests
+    Return the profiler state
+    """
+    check_admin(current_user)
+    if state.sample_rate is not None:
+        profiler.sample_rate = state.sample_rate
+    if state.next_requests is not None:
+        profiler.next_requests = state.next_requests
+    return profiler_state()
+
+
+@router.get(
+    path="/{name}",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Download a profile",
+    responses={403: {"model": Detail}, 404: {"model": Detail}},
+)
+def download_profile(
+    name: str, current_user: User = Depends(get_current_user_from_token)
+):
+    """
+    Download a profile
+
+    This path operation return a profile as collapsed stacks, ready for
+    flamegraph.pl or speedscope. Only superusers are allowed.
+
+    Parameters:
+        - Path parameter
+            - name: str, a file name listed in the profiler state
+    """
+    check_admin(current_user)
+    if name not in profiler.files():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(f"{profiler.directory}/{name}") as file:
+        return PlainTextResponse(file.read())
@@ -1,20 +1,48 @@
-from fastapi import APIRouter, Body, Depends, HTTPException
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
 
-from apis.v1.route_auth import get_current_user_from_token
+from apis.utils import (
+    async_variant,
+    bulk_result,
+    check_not_modified,
+    list_response,
+    serialize,
+    timeline_etag,
+    tweet_etag,
+)
+from apis.v1.route_auth import get_current_user_from_token, wait_for_own_likes
+from core.cache import response_cache, tweet_key
+from core.config import settings
+from core.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_search_cursor,
+    encode_search_cursor,
+)
 from db.repository.tweets import (
     create_new_tweet,
     deactivate_tweet,
+    get_existing_tweet_ids,
     get_tweet,
+    invalidate_tweets,
+    like_tweets,
+    likes_queue,
     mark_tweet_as_liked,
     mark_tweet_as_unliked,
     update_content_tweet,
 )
+from schemas.bulk import BulkIds, BulkResult
 from schemas.mixins import Detail
-from schemas.tweets import Tweet, TweetCreate
+from schemas.tweets import Tweet, TweetCreate, shape_tweet
 from db.models.users import User
-from db.session import get_db
+from db.repository import async_tweets
+from db.repository.search import search_tweets
+from db.repository.trending import get_trending_tweets
+from db.session import get_async_db, get_db
 
 router = APIRouter()
 
@@ -49,21 +77,127 @@ def post_tweet(
     return create_new_tweet(db, tweet, current_user)
 
 
+@router.get(
+    path="/trending",
+    response_model=List[Tweet],
+    status_code=status.HTTP_200_OK,
+    summary="Show trending tweets",
+)
+def trending_tweets(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=settings.TRENDING_MAX_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Trending tweets
+
+    This path operation show the recent tweets with the most likes for
+    their age, best first. The ranking of the likes done through other
+    workers is refreshed every TRENDING_RESCORE_SECONDS
+
+    Parameters:
+        - Query parameters
+            - limit: int
+    Return a json list with the tweets
+    """
+    tweets = get_trending_tweets(db, limit)
+    etag = timeline_etag(tweets, limit)
+    not_modified = check_not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    return list_response(response, tweets, shape_tweet)
+
+
+@router.get(
+    path="/search",
+    response_model=List[Tweet],
+    status_code=status.HTTP_200_OK,
+    summary="Search tweets",
+    responses={400: {"model": Detail}},
+)
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=250),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Search tweets
+
+    This path operation search the active tweets by their words. The matches
+    among the newest SEARCH_SCAN_ROWS tweets come first, best matches first,
+    then the older matches, newest first. When no tweet has the words, it
+    returns the tweets that contain the text, newest first
+
+    Parameters:
+        - Query parameters
+            - q: str, words, "a phrase", or, -word
+            - limit: int
+            - before: str, the cursor returned in the X-Next-Cursor header
+    Return a json list with the tweets of the page, the X-Search-Match header
+    says whether they match the words or the text
+    """
+    try:
+        cursor = decode_search_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    match, tweets, after = search_tweets(db, q, limit, cursor)
+    response.headers["X-Search-Match"] = match
+    if len(tweets) == limit:
+        response.headers["X-Next-Cursor"] = encode_search_cursor(*after)
+    return list_response(response, tweets, shape_tweet)
+
+
+def cache_key(tweet_id: str) -> str:
+    try:
+        return tweet_key(tweet_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Tweet not found")
+
+
+async def show_tweet_async(
+    tweet_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def load():
+        tweet = await async_tweets.get_tweet(db, tweet_id)
+        return serialize(Tweet, tweet) if tweet else None
+
+    payload = await response_cache.get_or_load_async(cache_key(tweet_id), load)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Tweet not found")
+    not_modified = check_not_modified(request, response, tweet_etag(payload))
+    return not_modified or payload
+
+
 @router.get(
     path="/{tweet_id}",
     response_model=Tweet,
     status_code=status.HTTP_200_OK,
     summary="Show a tweet",
     responses={404: {"model": Detail}},
+    dependencies=[Depends(wait_for_own_likes)],
 )
+@async_variant(show_tweet_async)
 def show_tweet(
     tweet_id: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
-    tweet = get_tweet(db, tweet_id)
-    if not tweet:
+    def load():
+        tweet = get_tweet(db, tweet_id)
+        return serialize(Tweet, tweet) if tweet else None
+
+    payload = response_cache.get_or_load(cache_key(tweet_id), load)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Tweet not found")
-    return tweet
+    not_modified = check_not_modified(request, response, tweet_etag(payload))
+    return not_modified or payload
 
 
 @router.delete(
@@ -140,3 +274,36 @@ def unlike_tweet(
         raise HTTPException(status_code=404, detail="Tweet not found")
 
     mark_tweet_as_unliked(db, tweet_to_unlike, current_user)
+
+
+@router.post(
+    path="/likes",
+    response_model=BulkResult,
+    status_code=status.HTTP_200_OK,
+    summary="Like several tweets",
+)
+def like_many_tweets(
+    tweets: BulkIds = Body(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    """
+    Like several tweets
+
+    This path operation like every existing tweet of the list in one
+    transaction
+
+    Parameters:
+        - Request body parameter
+            - tweets: BulkIds
+    Return a json with the status of each id:
+        - created: the tweet is liked now
+        - unchanged: the tweet was already liked
+        - not_found: the tweet does not exist
+    """
+    likes_queue.wait_for(current_user.email.lower())
+    existing = get_existing_tweet_ids(db, tweets.ids)
+    changed = like_tweets(db, current_user.id, list(existing))
+    db.commit()
+    invalidate_tweets(changed)
+    return bulk_result(tweets.ids, existing, changed)
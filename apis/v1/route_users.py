@@ -1,41 +1,81 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
 
+from apis.utils import (
+    async_variant,
+    bulk_result,
+    check_not_modified,
+    list_response,
+    parse_cursor,
+    serialize,
+    set_next_cursor,
+    user_etag,
+)
 from apis.v1.route_auth import get_current_user_from_token
+from core.cache import response_cache, user_key
 from db.repository.users import (
     deactivate_user,
     follow_a_user,
+    follow_users,
     following_user,
-    get_all_users,
+    get_existing_user_ids,
     get_user,
+    get_users_page,
     unfollow_a_user,
     update_data_user,
 )
-from db.session import get_db
-from schemas.users import User, UserBasicData, UserDetail
+from db.repository import async_users
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from db.session import get_async_db, get_db
+from schemas.bulk import BulkIds, BulkResult
+from schemas.users import User, UserBasicData, UserDetail, shape_user
 from schemas.mixins import Detail
 from db.models.users import User as UserModel
 
 router = APIRouter()
 
 
+async def show_all_users_async(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    users = await async_users.get_users_page(db, limit, parse_cursor(before), is_active)
+    set_next_cursor(response, users, limit)
+    return list_response(response, users, shape_user)
+
+
 @router.get(
     path="",
     response_model=List[User],
     status_code=status.HTTP_200_OK,
     summary="Show all users",
+    responses={400: {"model": Detail}},
 )
-def show_all_users(db: Session = Depends(get_db)):
+@async_variant(show_all_users_async)
+def show_all_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    db: Session = Depends(get_db),
+):
     """
     List users
 
-    This path operation show all users in the app
+    This path operation show the users in the app, newest first
 
     Parameters:
-        -
+        - Query parameters
+            - limit: int
+            - before: str, the cursor returned in the X-Next-Cursor header
+            - is_active: bool, only active or inactive users
     Return a json list with the basic user information:
         - user_id: UUID
         - email: EmailStr
@@ -43,7 +83,9 @@ def show_all_users(db: Session = Depends(get_db)):
         - last_name: str
         - birth_date: date
     """
-    return get_all_users(db)
+    users = get_users_page(db, limit, parse_cursor(before), is_active)
+    set_next_cursor(response, users, limit)
+    return list_response(response, users, shape_user)
 
 
 @router.get(
@@ -59,6 +101,30 @@ def me(
     return current_user
 
 
+def cache_key(user_id: str) -> str:
+    try:
+        return user_key(user_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+async def show_user_async(
+    user_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def load():
+        user = await async_users.get_user(db, user_id)
+        return serialize(User, user) if user else None
+
+    payload = await response_cache.get_or_load_async(cache_key(user_id), load)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    not_modified = check_not_modified(request, response, user_etag(payload))
+    return not_modified or payload
+
+
 @router.get(
     path="/{user_id}",
     response_model=User,
@@ -66,11 +132,22 @@ def me(
     summary="Show a user",
     responses={404: {"model": Detail}},
 )
-def show_user(user_id: str, db: Session = Depends(get_db)):
-    user = get_user(db, user_id)
-    if not user:
+@async_variant(show_user_async)
+def show_user(
+    user_id: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    def load():
+        user = get_user(db, user_id)
+        return serialize(User, user) if user else None
+
+    payload = response_cache.get_or_load(cache_key(user_id), load)
+    if payload is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    not_modified = check_not_modified(request, response, user_etag(payload))
+    return not_modified or payload
 
 
 @router.delete(
@@ -161,3 +238,36 @@ def unfollow_user(
         return
 
     unfollow_a_user(db, current_user, user_id)
+
+
+@router.post(
+    path="/follows",
+    response_model=BulkResult,
+    status_code=status.HTTP_200_OK,
+    summary="Follow several users",
+)
+def follow_many_users(
+    users: BulkIds = Body(...),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user_from_token),
+):
+    """
+    Follow several users
+
+    This path operation follow every existing user of the list in one
+    transaction
+
+    Parameters:
+        - Request body parameter
+            - users: BulkIds
+    Return a json with the status of each id:
+        - created: the user is followed now
+        - unchanged: the user was already followed
+        - not_found: the user does not exist
+        - invalid: the id is the current user
+    """
+    invalid = {current_user.id}
+    existing = get_existing_user_ids(db, [it for it in users.ids if it not in invalid])
+    changed = follow_users(db, current_user, list(existing))
+    db.commit()
+    return bulk_result(users.ids, existing, changed, invalid)
@@ -0,0 +1,493 @@
+"""
+Drive every route in apis/v1 with concurrent clients and report throughput,
+p50/p95/p99 latency and SQL queries per request, as a JSON baseline that can
+be diffed between commits.
+
+The app is served by uvicorn in this process (so queries can be counted from
+the engine events) against the database in DATABASE_URL. Use a disposable
+database: the run signs up, updates, follows, likes and deletes things, and
+marks the first seeded user as superuser for the admin routes.
+
+Usage:
+    python -m benchmarks.load --seed-users 10000 --output baseline.json
+    python -m benchmarks.load --requests 500 --compare baseline.json
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import uvicorn
+from sqlalchemy import event
+
+from core.config import settings
+from core.profiler import profiler
+from core.security import create_access_token
+from core.synthetic import SyntheticDataset
+from db.models.tweets import Tweet
+from db.models.users import User
+from db.repository.tokens import create_refresh_token
+from db.repository.users import invalidate_principal
+from db.session import SessionLocal, async_engine, engine
+
+
+SAMPLE_SIZE = 1000
+TOKEN_LIFETIME = timedelta(hours=2)
+
+
+class QueryCounter:
+    def __init__(self, engines):
+        self.count = 0
+        self._lock = threading.Lock()
+        for it in engines:
+            event.listen(it, "before_cursor_execute", self._increment)
+
+    def _increment(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class Context:
+    """Ids and tokens the scenarios pick from; each client has its own user."""
+
+    def __init__(self, clients: int, password: str):
+        self.password = password
+        db = SessionLocal()
+        try:
+            admin = db.query(User).order_by(User.email).first()
+            if admin is None:
+                raise SystemExit("The database is empty, run with --seed-users")
+            if not admin.is_superuser:
+                admin.is_superuser = True
+                db.commit()
+                invalidate_principal(admin.email)
+            self.admin_token = token(admin.email)
+            users = (
+                db.query(User.id, User.email)
+                .filter(User.is_active.is_(True), User.id != admin.id)
+                .order_by(User.created_at.desc())
+                .limit(SAMPLE_SIZE)
+                .all()
+            )
+            tweets = (
+                db.query(Tweet.id, Tweet.content)
+                .filter(Tweet.is_active.is_(True))
+                .order_by(Tweet.created_at.desc())
+                .limit(SAMPLE_SIZE)
+                .all()
+            )
+            refresh_tokens = [
+                create_refresh_token(db, db.get(User, it.id)) for it in users[:clients]
+            ]
+        finally:
+            db.close()
+        if len(users) < clients:
+            raise SystemExit(f"Need at least {clients} active users")
+        self.user_ids = [str(it.id) for it in users]
+        self.tweet_ids = [str(it.id) for it in tweets]
+        self.search_terms = sorted({it.content.split()[0] for it in tweets})
+        self.clients = [
+            {
+                "id": str(it.id),
+                "email": it.email,
+                "token": token(it.email),
+                "refresh_token": refresh_token,
+            }
+            for it, refresh_token in zip(users, refresh_tokens)
+        ]
+        self.created_tweets = [[] for _ in range(clients)]
+        self.signed_up = []
+        self._lock = threading.Lock()
+
+    def pop_signed_up(self):
+        with self._lock:
+            return self.signed_up.pop() if self.signed_up else str(uuid.uuid4())
+
+
+def token(email: str) -> str:
+    return create_access_token(data={"sub": email}, expires_delta=TOKEN_LIFETIME)
+
+
+def bearer(value: str) -> dict:
+    return {"Authorization": f"Bearer {value}"}
+
+
+def as_json(body) -> tuple:
+    return json.dumps(body), "application/json"
+
+
+# Each scenario returns (method, path, (body, content type) or None, headers)
+# for one request of client `worker`; `rand` is that client's Random.
+
+
+def signup(ctx, worker, rand):
+    email = f"bench-{uuid.uuid4().hex}@example.com"
+    body = {
+        "email": email,
+        "password": ctx.password,
+        "first_name": "Bench",
+        "last_name": "Mark",
+    }
+    return "POST", "/auth/signup", as_json(body), {}
+
+
+def login(ctx, worker, rand):
+    form = {"username": ctx.clients[worker]["email"], "password": ctx.password}
+    return (
+        "POST",
+        "/auth/login",
+        (urlencode(form), "application/x-www-form-urlencoded"),
+        {},
+    )
+
+
+def refresh(ctx, worker, rand):
+    body = {"refresh_token": ctx.clients[worker]["refresh_token"]}
+    return "POST", "/auth/refresh", as_json(body), {}
+
+
+def home(ctx, worker, rand):
+    return "GET", "/home", None, {}
+
+
+def home_following(ctx, worker, rand):
+    return "GET", "/home/following", None, bearer(ctx.clients[worker]["token"])
+
+
+def list_users(ctx, worker, rand):
+    return "GET", "/users", None, {}
+
+
+def me(ctx, worker, rand):
+    return "GET", "/users/me", None, bearer(ctx.clients[worker]["token"])
+
+
+def show_user(ctx, worker, rand):
+    return "GET", f"/users/{rand.choice(ctx.user_ids)}", None, {}
+
+
+def update_user(ctx, worker, rand):
+    client = ctx.clients[worker]
+    body = {"first_name": "Bench", "last_name": f"Mark{rand.randrange(1000)}"}
+    return "PUT", f"/users/{client['id']}", as_json(body), bearer(client["token"])
+
+
+def follow_user(ctx, worker, rand):
+    path = f"/users/{rand.choice(ctx.user_ids)}/follow"
+    return "POST", path, None, bearer(ctx.clients[worker]["token"])
+
+
+def unfollow_user(ctx, worker, rand):
+    path = f"/users/{rand.choice(ctx.user_ids)}/follow"
+    return "DELETE", path, None, bearer(ctx.clients[worker]["token"])
+
+
+def follow_many_users(ctx, worker, rand):
+    body = {"ids": rand.sample(ctx.user_ids, min(20, len(ctx.user_ids)))}
+    return "POST", "/users/follows", as_json(body), bearer(ctx.clients[worker]["token"])
+
+
+def delete_user(ctx, worker, rand):
+    return "DELETE", f"/users/{ctx.pop_signed_up()}", None, bearer(ctx.admin_token)
+
+
+def create_tweet(ctx, worker, rand):
+    body = {"content": f"Benchmark tweet {rand.randrange(10**6)}"}
+    return "POST", "/tweets", as_json(body), bearer(ctx.clients[worker]["token"])
+
+
+def show_tweet(ctx, worker, rand):
+    return "GET", f"/tweets/{rand.choice(ctx.tweet_ids)}", None, {}
+
+
+def trending_tweets(ctx, worker, rand):
+    return "GET", "/tweets/trending?limit=100", None, {}
+
+
+def search_tweets(ctx, worker, rand):
+    query = urlencode({"q": rand.choice(ctx.search_terms)})
+    return "GET", f"/tweets/search?{query}", None, {}
+
+
+def update_tweet(ctx, worker, rand):
+    tweet_id = rand.choice(ctx.created_tweets[worker] or ctx.tweet_ids)
+    body = {"content": f"Edited tweet {rand.randrange(10**6)}"}
+    return (
+        "PUT",
+        f"/tweets/{tweet_id}",
+        as_json(body),
+        bearer(ctx.clients[worker]["token"]),
+    )
+
+
+def like_tweet(ctx, worker, rand):
+    path = f"/tweets/{rand.choice(ctx.tweet_ids)}/like"
+    return "POST", path, None, bearer(ctx.clients[worker]["token"])
+
+
+def unlike_tweet(ctx, worker, rand):
+    path = f"/tweets/{rand.choice(ctx.tweet_ids)}/like"
+    return "DELETE", path, None, bearer(ctx.clients[worker]["token"])
+
+
+def like_many_tweets(ctx, worker, rand):
+    body = {"ids": rand.sample(ctx.tweet_ids, min(20, len(ctx.tweet_ids)))}
+    return "POST", "/tweets/likes", as_json(body), bearer(ctx.clients[worker]["token"])
+
+
+def delete_tweet(ctx, worker, rand):
+    created = ctx.created_tweets[worker]
+    tweet_id = created.pop() if created else str(uuid.uuid4())
+    return "DELETE", f"/tweets/{tweet_id}", None, bearer(ctx.clients[worker]["token"])
+
+
+def metrics(ctx, worker, rand):
+    return "GET", "/metrics", None, {}
+
+
+def db_pool(ctx, worker, rand):
+    return "GET", "/metrics/db-pool", None, {}
+
+
+def export_users(ctx, worker, rand):
+    return "GET", "/exports/users?format=ndjson", None, bearer(ctx.admin_token)
+
+
+def show_profiler(ctx, worker, rand):
+    return "GET", "/profiler", None, bearer(ctx.admin_token)
+
+
+def update_profiler(ctx, worker, rand):
+    # the next request is profiled, which leaves files to download
+    body = {"next_requests": 1}
+    return "PUT", "/profiler", as_json(body), bearer(ctx.admin_token)
+
+
+def download_profile(ctx, worker, rand):
+    name = rand.choice(profiler.files() or ["missing.folded"])
+    return "GET", f"/profiler/{name}", None, bearer(ctx.admin_token)
+
+
+# In run order: writes that later scenarios consume come first.
+SCENARIOS = [
+    ("auth.signup", signup),
+    ("auth.login", login),
+    ("auth.refresh", refresh),
+    ("home", home),
+    ("home.following", home_following),
+    ("users.list", list_users),
+    ("users.me", me),
+    ("users.show", show_user),
+    ("users.update", update_user),
+    ("users.follow", follow_user),
+    ("users.unfollow", unfollow_user),
+    ("users.follows", follow_many_users),
+    ("users.delete", delete_user),
+    ("tweets.create", create_tweet),
+    ("tweets.show", show_tweet),
+    ("tweets.trending", trending_tweets),
+    ("tweets.search", search_tweets),
+    ("tweets.update", update_tweet),
+    ("tweets.like", like_tweet),
+    ("tweets.unlike", unlike_tweet),
+    ("tweets.likes", like_many_tweets),
+    ("tweets.delete", delete_tweet),
+    ("metrics", metrics),
+    ("metrics.db_pool", db_pool),
+    ("exports.users", export_users),
+    ("profiler.show", show_profiler),
+    ("profiler.update", update_profiler),
+    ("profiler.download", download_profile),
+]
+
+
+def seed(users: int, password: str):
+    from commands.bulk_load import finish, load
+
+    dataset = SyntheticDataset(users, password=password, seed=0)
+    db = SessionLocal()
+    try:
+        for name in ("users", "tweets", "follows", "likes"):
+            load(db, name, getattr(dataset, name)(), 50000)
+        finish(db, True)
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    from main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def run_scenario(name, build, ctx, port, clients, requests, counter):
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+
+    def client(worker):
+        rand = random.Random(f"{name}-{worker}")
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        own_latencies, own_statuses = [], Counter()
+        barrier.wait()
+        for _ in range(requests // clients + (worker < requests % clients)):
+            method, path, body, headers = build(ctx, worker, rand)
+            if body is not None:
+                body, headers["Content-Type"] = body
+            started = time.perf_counter()
+            try:
+                connection.request(method, "/api/v1" + path, body=body, headers=headers)
+                response = connection.getresponse()
+                payload = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                own_statuses[0] += 1
+                continue
+            own_latencies.append(time.perf_counter() - started)
+            own_statuses[response.status] += 1
+            if response.status == 201 and name == "tweets.create":
+                ctx.created_tweets[worker].append(json.loads(payload)["id"])
+            elif response.status == 201 and name == "auth.signup":
+                with ctx._lock:
+                    ctx.signed_up.append(json.loads(payload)["id"])
+            elif response.status == 200 and name == "auth.refresh":
+                # each refresh token works once
+                refresh_token = json.loads(payload)["refresh_token"]
+                ctx.clients[worker]["refresh_token"] = refresh_token
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            statuses.update(own_statuses)
+
+    threads = [threading.Thread(target=client, args=(it,)) for it in range(clients)]
+    for thread in threads:
+        thread.start()
+    queries_before = counter.count
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+
+    cuts = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    )
+    return {
+        "requests": len(latencies),
+        "errors": sum(
+            count for code, count in statuses.items() if code >= 500 or code == 0
+        ),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+        "queries_per_request": round(queries / max(len(latencies), 1), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(routes: dict, baseline: dict):
+    print(f"\n{'route':<18}{'p50':>16}{'p99':>16}{'rps':>16}{'queries':>14}")
+    for name, result in routes.items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p99_ms", "rps"):
+            change = (result[key] - old[key]) / old[key] * 100 if old[key] else 0
+            cells.append(f"{result[key]:>8} {change:+6.1f}%")
+        queries = f"{old['queries_per_request']}->{result['queries_per_request']}"
+        print(f"{name:<18}{''.join(f'{it:>16}' for it in cells)}{queries:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed-users", type=int, default=0)
+    parser.add_argument(
+        "--password", default="password", help="password of the existing users"
+    )
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="per route")
+    parser.add_argument(
+        "--routes", nargs="*", help="only run the routes starting with these names"
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to diff against")
+    args = parser.parse_args()
+
+    if args.seed_users:
+        seed(args.seed_users, args.password)
+    ctx = Context(args.clients, args.password)
+    engines = [engine] + ([async_engine.sync_engine] if async_engine else [])
+    counter = QueryCounter(engines)
+    port = free_port()
+    server = start_server(port)
+
+    routes = {}
+    try:
+        for name, build in SCENARIOS:
+            if args.routes and not any(name.startswith(it) for it in args.routes):
+                continue
+            result = routes[name] = run_scenario(
+                name, build, ctx, port, args.clients, args.requests, counter
+            )
+            print(
+                f"{name:<18} {result['rps']:>8} req/s  p50 {result['p50_ms']:>7} ms"
+                f"  p95 {result['p95_ms']:>7} ms  p99 {result['p99_ms']:>7} ms"
+                f"  {result['queries_per_request']:>5} queries  {result['statuses']}"
+            )
+    finally:
+        server.should_exit = True
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "clients": args.clients,
+            "requests_per_route": args.requests,
+            "async_db_reads": settings.ASYNC_DB_READS,
+            "fast_json_responses": settings.FAST_JSON_RESPONSES,
+        },
+        "routes": routes,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+    if args.compare:
+        with open(args.compare) as file:
+            compare(routes, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
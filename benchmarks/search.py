@@ -0,0 +1,213 @@
+"""
+Measure tweet search against the database in DATABASE_URL: p50/p95/p99 of
+one page per kind of query (common, rare and two words, phrase, part of a
+word and the next page of common words), with the plans of the slowest
+query of each kind so the GIN indexes can be checked. Terms are drawn from
+a sample of the tweets themselves.
+
+Usage:
+    python -m benchmarks.search --seed-tweets 10000000 --output search.json
+    python -m benchmarks.search --repeat 50 --budget-ms 50
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from itertools import chain
+
+from sqlalchemy import event, text
+
+from core.pagination import decode_search_cursor, encode_search_cursor
+from core.synthetic import SyntheticDataset
+from db.base import Base  # noqa: F401, maps every model
+from db.repository.search import search_tweets
+from db.session import SessionLocal, engine
+
+SAMPLE_ROWS = 5000
+
+
+def seed(tweets: int, password: str):
+    from commands.bulk_load import finish, load
+
+    dataset = SyntheticDataset(
+        max(tweets // 10, 1),
+        tweets_per_user=10,
+        follows_per_user=0,
+        likes_per_user=0,
+        password=password,
+        seed=0,
+    )
+    db = SessionLocal()
+    try:
+        for name in ("users", "tweets"):
+            load(db, name, getattr(dataset, name)(), 50000)
+        finish(db, False)
+        db.execute(text("ANALYZE tweet"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def sample_terms(db, tweets: int, count: int, rand: random.Random) -> dict:
+    """
+    Queries of each kind from about SAMPLE_ROWS random tweets: their most
+    and least frequent words, then words, phrases and parts of words of some
+    of them.
+    """
+    percent = min(100.0, SAMPLE_ROWS * 100 / max(tweets, 1))
+    contents = [
+        row.content.lower().split()
+        for row in db.execute(
+            text(
+                f"SELECT content FROM tweet TABLESAMPLE SYSTEM ({percent}) "
+                f"WHERE is_active LIMIT {SAMPLE_ROWS}"
+            )
+        )
+    ]
+    contents = [it for it in contents if len(it) > 1]
+    if not contents:
+        raise SystemExit("No tweets to search, seed some with --seed-tweets")
+    ranked = [word for word, _ in Counter(chain(*contents)).most_common()]
+    picked = [rand.choice(contents) for _ in range(count)]
+    phrases = []
+    for content in picked:
+        start = rand.randrange(len(content) - 1)
+        phrases.append(content[start : start + 2])
+    return {
+        "common": ranked[:count],
+        "rare": ranked[-count:],
+        "two_words": [" ".join(rand.sample(content, 2)) for content in picked],
+        "phrase": [f'"{" ".join(phrase)}"' for phrase in phrases],
+        "substring": [max(content, key=len)[1:5] for content in picked],
+    }
+
+
+def measure(db, queries: list, repeat: int, limit: int, next_page: bool) -> dict:
+    latencies, matches, rows_count, slowest = [], {}, [], (0, None)
+    for query in queries:
+        before = None
+        if next_page:
+            match, rows, after = search_tweets(db, query, limit)
+            if len(rows) < limit:
+                continue
+            before = decode_search_cursor(encode_search_cursor(*after))
+        for _ in range(repeat):
+            started = time.perf_counter()
+            match, rows, _ = search_tweets(db, query, limit, before)
+            latencies.append(time.perf_counter() - started)
+            if latencies[-1] > slowest[0]:
+                slowest = (latencies[-1], (query, before))
+            db.rollback()
+        matches[match] = matches.get(match, 0) + 1
+        rows_count.append(len(rows))
+    if not latencies:
+        return {}
+    cuts = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    )
+    return {
+        "queries": len(rows_count),
+        "slowest": slowest[1],
+        "matches": matches,
+        "rows_avg": round(statistics.mean(rows_count), 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+def explain(db, query: str, limit: int, before=None) -> list:
+    """EXPLAIN ANALYZE the statements of one search."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        search_tweets(db, query, limit, before)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    plans = []
+    for statement, parameters in statements:
+        result = db.connection().exec_driver_sql(
+            "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+        )
+        plans.append([row[0] for row in result])
+    db.rollback()
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed-tweets", type=int, default=0)
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--queries", type=int, default=10, help="per kind")
+    parser.add_argument("--repeat", type=int, default=20, help="per query")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument(
+        "--budget-ms", type=float, help="exit with 1 when a p95 is over this"
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.seed_tweets:
+        seed(args.seed_tweets, args.password)
+
+    db = SessionLocal()
+    try:
+        tweets = db.execute(text("SELECT count(*) FROM tweet")).scalar()
+        terms = sample_terms(db, tweets, args.queries, random.Random(0))
+        kinds = {
+            **{kind: (queries, False) for kind, queries in terms.items()},
+            "common.next_page": (terms["common"], True),
+        }
+        results, plans = {}, {}
+        for kind, (queries, next_page) in kinds.items():
+            result = measure(db, queries, args.repeat, args.limit, next_page)
+            if not result:
+                continue
+            results[kind] = result
+            query, before = result.pop("slowest")
+            plans[kind] = explain(db, query, args.limit, before)
+            print(
+                f"{kind:<18} p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms"
+                f"  p99 {result['p99_ms']:>7} ms  {result['rows_avg']:>5} rows"
+                f"  {result['matches']}"
+            )
+    finally:
+        db.close()
+
+    indexes = sorted(
+        {
+            word
+            for kind_plans in plans.values()
+            for plan in kind_plans
+            for line in plan
+            for word in line.replace("(", " ").split()
+            if word.startswith("ix_tweet_")
+        }
+    )
+    print(f"\n{tweets} tweets, indexes used: {', '.join(indexes) or 'none'}")
+
+    if args.output:
+        report = {
+            "meta": {"tweets": tweets, "repeat": args.repeat, "limit": args.limit},
+            "kinds": results,
+            "plans": plans,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.budget_ms is not None:
+        over = [k for k, it in results.items() if it["p95_ms"] > args.budget_ms]
+        if over:
+            print(f"p95 over {args.budget_ms} ms: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare the default response_model path with the FAST_JSON_RESPONSES path
+on a page of tweets. No database is needed, the tweets are transient ORM
+objects.
+
+Usage: python -m benchmarks.serialization [--items 1000] [--rounds 50]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from db.models.tweets import Tweet as TweetModel
+from db.models.users import User as UserModel
+from schemas.tweets import Tweet, shape_tweet
+
+
+def make_tweets(count: int):
+    now = datetime.utcnow()
+    users = [
+        UserModel(
+            id=uuid.uuid4(),
+            email=f"user{it}@example.com",
+            first_name="First",
+            last_name="Last",
+            birth_date=date(1990, 1, 1),
+        )
+        for it in range(50)
+    ]
+    return [
+        TweetModel(
+            id=uuid.uuid4(),
+            content="x" * 140,
+            created_at=now - timedelta(seconds=it),
+            updated_at=now - timedelta(seconds=it),
+            likes_count=it,
+            user=users[it % len(users)],
+        )
+        for it in range(count)
+    ]
+
+
+def build_app(tweets):
+    app = FastAPI()
+
+    @app.get("/model", response_model=List[Tweet])
+    def model_path():
+        return tweets
+
+    @app.get("/fast", response_model=List[Tweet])
+    def fast_path():
+        return ORJSONResponse([shape_tweet(it) for it in tweets])
+
+    return app
+
+
+def measure(client, path: str, rounds: int) -> float:
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        client.get(path)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    app = build_app(make_tweets(args.items))
+    client = TestClient(app)
+    model_body = client.get("/model").json()
+    fast_body = client.get("/fast").json()
+    assert model_body == fast_body, "fast path output differs from response_model"
+    paths = app.openapi()["paths"]
+    schemas = [
+        paths[path]["get"]["responses"]["200"]["content"]["application/json"]
+        for path in ("/model", "/fast")
+    ]
+    assert schemas[0]["schema"]["items"] == schemas[1]["schema"]["items"]
+
+    model_ms = measure(client, "/model", args.rounds)
+    fast_ms = measure(client, "/fast", args.rounds)
+    print(
+        json.dumps(
+            {
+                "items": args.items,
+                "response_model_ms": round(model_ms, 2),
+                "fast_json_ms": round(fast_ms, 2),
+                "speedup": round(model_ms / fast_ms, 2),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
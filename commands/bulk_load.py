@@ -0,0 +1,110 @@
+"""
+Bulk load users, tweets, likes and follows with COPY, then recompute the
+counters (and optionally the timelines) the API keeps denormalized.
+
+Usage:
+    python -m commands.bulk_load load users users.ndjson [--format csv]
+    python -m commands.bulk_load seed --users 10000 [--tweets-per-user 10]
+
+Input files use the layout written by commands.export. Users need either a
+hashed_password (loaded as is, export them with --with-password-hash) or a
+plain password (hashed while loading, which is slow). Rows whose user or
+tweet does not exist, or that are already loaded, are skipped and counted.
+"""
+import argparse
+import csv
+import json
+import time
+
+from core.export import FORMATS
+from core.synthetic import SyntheticDataset
+from db.repository.bulk_load import LOAD_TABLES, bulk_load
+from db.repository.timelines import rebuild_timelines
+from db.repository.tweets import reconcile_likes_count
+from db.repository.users import reconcile_follow_counts
+from db.session import SessionLocal
+
+
+def read_records(path: str, fmt: str):
+    with open(path, newline="") as file:
+        if fmt == "csv":
+            for row in csv.DictReader(file):
+                yield {key: value for key, value in row.items() if value != ""}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load(db, dataset: str, records, batch_size: int):
+    started = time.perf_counter()
+    read, inserted = bulk_load(db, dataset, records, batch_size)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{dataset}: read {read}, inserted {inserted}, skipped {read - inserted} "
+        f"in {elapsed:.1f}s"
+    )
+
+
+def finish(db, timelines: bool):
+    reconcile_likes_count(db)
+    reconcile_follow_counts(db)
+    if timelines:
+        rebuild_timelines(db)
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--batch-size", type=int, default=50000)
+    common.add_argument(
+        "--skip-timelines",
+        action="store_true",
+        help="do not rebuild the fan-out timelines after loading",
+    )
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = commands.add_parser("load", parents=[common])
+    load_parser.add_argument("dataset", choices=sorted(LOAD_TABLES))
+    load_parser.add_argument("path")
+    load_parser.add_argument("--format", choices=FORMATS, default="ndjson")
+
+    seed_parser = commands.add_parser("seed", parents=[common])
+    seed_parser.add_argument("--users", type=int, required=True)
+    seed_parser.add_argument("--tweets-per-user", type=float, default=10)
+    seed_parser.add_argument("--follows-per-user", type=float, default=20)
+    seed_parser.add_argument("--likes-per-user", type=float, default=20)
+    seed_parser.add_argument("--alpha", type=float, default=1.2)
+    seed_parser.add_argument("--password", default="password")
+    seed_parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "load":
+            records = read_records(args.path, args.format)
+            try:
+                load(db, args.dataset, records, args.batch_size)
+            except ValueError as error:
+                parser.exit(1, f"{error}\n")
+        else:
+            dataset = SyntheticDataset(
+                args.users,
+                tweets_per_user=args.tweets_per_user,
+                follows_per_user=args.follows_per_user,
+                likes_per_user=args.likes_per_user,
+                alpha=args.alpha,
+                password=args.password,
+                seed=args.seed,
+            )
+            load(db, "users", dataset.users(), args.batch_size)
+            load(db, "tweets", dataset.tweets(), args.batch_size)
+            load(db, "follows", dataset.follows(), args.batch_size)
+            load(db, "likes", dataset.likes(), args.batch_size)
+        finish(db, not args.skip_timelines)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Stream a dataset (users, tweets, likes or follows) as NDJSON or CSV.
+
+Usage: python -m commands.export tweets [--format csv] [--gzip] [--output FILE]
+
+Users are exported without their password hash unless --with-password-hash
+is given, which commands.bulk_load needs to load them back.
+"""
+import argparse
+import sys
+
+from core.export import FORMATS
+from db.repository.exports import EXPORT_COLUMNS, stream_export
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dataset", choices=sorted(EXPORT_COLUMNS))
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--output", help="file to write, defaults to stdout")
+    parser.add_argument(
+        "--with-password-hash",
+        action="store_true",
+        help="export the users' hashed_password, to load them back elsewhere",
+    )
+    args = parser.parse_args()
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        chunks = stream_export(
+            args.dataset, args.format, args.gzip, args.with_password_hash
+        )
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Rebuild every following timeline from the follows and tweets, e.g. after an
+author dropped back below FANOUT_MAX_FOLLOWERS.
+
+Usage: python -m commands.rebuild_timelines
+"""
+from db.repository.timelines import rebuild_timelines
+from db.session import SessionLocal
+
+
+def main():
+    db = SessionLocal()
+    try:
+        rebuild_timelines(db)
+    finally:
+        db.close()
+    print("Rebuilt the timelines")
+
+
+if __name__ == "__main__":
+    main()
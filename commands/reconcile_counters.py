@@ -0,0 +1,22 @@
+"""
+Recompute the denormalized like and follow counters from the relation tables.
+
+Usage: python -m commands.reconcile_counters
+"""
+from db.repository.tweets import reconcile_likes_count
+from db.repository.users import reconcile_follow_counts
+from db.session import SessionLocal
+
+
+def main():
+    db = SessionLocal()
+    try:
+        tweets = reconcile_likes_count(db)
+        users = reconcile_follow_counts(db)
+    finally:
+        db.close()
+    print(f"Reconciled {tweets} tweets and {users} users")
+
+
+if __name__ == "__main__":
+    main()
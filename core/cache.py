@@ -0,0 +1,251 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from uuid import UUID
+
+from core.config import settings
+
+
+class TTLCache:
+    """
+    Thread safe LRU cache whose entries also expire after `ttl` seconds.
+
+    It is local to the process, so with several workers an entry can stay
+    stale in the other workers for up to `ttl` seconds after invalidation.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class FakeRedis:
+    """In memory stand-in for the few redis client methods RedisCache uses."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None or item[0] < time.monotonic():
+                self._data.pop(name, None)
+                return None
+            return item[1]
+
+    def setex(self, name, seconds, value):
+        with self._lock:
+            self._data[name] = (time.monotonic() + seconds, value)
+
+    def delete(self, *names):
+        with self._lock:
+            for name in names:
+                self._data.pop(name, None)
+
+
+class RedisCache:
+    """Cache backend storing JSON values in redis (or anything redis-like)."""
+
+    def __init__(self, client, ttl: float, prefix: str = "fast-tweet:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        seconds = max(int(self.ttl if ttl is None else ttl), 1)
+        self.client.setex(self.prefix + key, seconds, json.dumps(value))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers wait."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = [threading.Lock(), 0]
+            call[1] += 1
+        try:
+            with call[0]:
+                return func()
+        finally:
+            with self._lock:
+                call[1] -= 1
+                if not call[1]:
+                    del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines of one event loop."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._calls:
+            call = self._calls[key]
+            try:
+                # a waiter cancelled does not cancel the call it waits for
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+                # its caller was cancelled, make the call again
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await func()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as exc:
+            call.set_exception(exc)
+            call.exception()  # retrieved, even when nobody waits
+            raise
+        else:
+            call.set_result(value)
+            return value
+        finally:
+            del self._calls[key]
+
+
+class ReadThroughCache:
+    """
+    Read-through cache over any backend with get/set/delete. On a miss only
+    one caller per key runs the loader, the others wait and reuse its value.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.backend.get(key)
+
+    def set(self, key: str, value: Any):
+        self.backend.set(key, value)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Optional[Any]:
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        def load():
+            value = self.backend.get(key)
+            if value is None:
+                value = loader()
+                if value is not None:
+                    self.backend.set(key, value)
+            return value
+
+        return self.flight.do(key, load)
+
+    async def get_or_load_async(
+        self, key: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Optional[Any]:
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        async def load():
+            value = self.backend.get(key)
+            if value is None:
+                value = await loader()
+                if value is not None:
+                    self.backend.set(key, value)
+            return value
+
+        return await self.async_flight.do(key, load)
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+def build_response_cache() -> ReadThroughCache:
+    backend = settings.RESPONSE_CACHE_BACKEND
+    ttl = settings.RESPONSE_CACHE_TTL_SECONDS
+    if backend == "redis":
+        import redis
+
+        client = redis.Redis.from_url(settings.RESPONSE_CACHE_URL)
+        return ReadThroughCache(RedisCache(client, ttl))
+    if backend == "fake-redis":
+        return ReadThroughCache(RedisCache(FakeRedis(), ttl))
+    if backend == "none":
+        return ReadThroughCache(NullCache())
+    return ReadThroughCache(TTLCache(settings.RESPONSE_CACHE_SIZE, ttl))
+
+
+# keyed by the canonical UUID whatever the spelling of the id, ValueError
+# when it is not one
+def tweet_key(tweet_id) -> str:
+    return f"tweet:{UUID(str(tweet_id))}"
+
+
+def user_key(user_id) -> str:
+    return f"user:{UUID(str(user_id))}"
+
+
+response_cache = build_response_cache()
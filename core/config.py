@@ -11,9 +11,117 @@ class Settings:
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", 5432)
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "postgres")
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Serve the read routes that have an async variant (a tweet, a user, the
+    # users listing and the home timeline) through asyncpg. Writes, likes,
+    # follows and login stay on the sync engine. ASYNC_DB is the old name.
+    ASYNC_DB_READS: bool = (
+        os.getenv("ASYNC_DB_READS", os.getenv("ASYNC_DB", "false")).lower() == "true"
+    )
+    ASYNC_DATABASE_URL: str = os.getenv(
+        "ASYNC_DATABASE_URL",
+        (DATABASE_URL or "").replace("postgresql://", "postgresql+asyncpg://", 1),
+    )
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Behind PgBouncer in transaction mode: no client side pool and no
+    # server side prepared statements.
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+    # How often each process reloads the revoked subjects
+    REVOCATION_SYNC_SECONDS: int = int(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+    # Put the user id, is_active and is_superuser in the access tokens and
+    # trust them instead of loading the user on each request. Changes to
+    # those columns show up once the token expires.
+    JWT_STATELESS_PRINCIPAL: bool = (
+        os.getenv("JWT_STATELESS_PRINCIPAL", "false").lower() == "true"
+    )
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    HASHER_WORKERS: int = int(os.getenv("HASHER_WORKERS", 4))
+    HASHER_MAX_PENDING: int = int(os.getenv("HASHER_MAX_PENDING", 16))
+
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+
+    # memory, redis, fake-redis or none
+    RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_URL: str = os.getenv(
+        "RESPONSE_CACHE_URL", "redis://localhost:6379/0"
+    )
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 10000))
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 30))
+
+    # Serialize list responses with orjson from plain dicts, skipping the
+    # per item response_model validation
+    FAST_JSON_RESPONSES: bool = (
+        os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+    )
+
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", 5000))
+
+    # Tweets of authors with more followers are read, not fanned out, see
+    # db.repository.timelines
+    FANOUT_MAX_FOLLOWERS: int = int(os.getenv("FANOUT_MAX_FOLLOWERS", 10000))
+    FANOUT_BACKFILL_TWEETS: int = int(os.getenv("FANOUT_BACKFILL_TWEETS", 50))
+
+    # Queue likes and unlikes and write them in batches every
+    # LIKES_FLUSH_INTERVAL_MS, see core.write_behind for what a crash loses
+    # with and without LIKES_JOURNAL_DIR.
+    LIKES_WRITE_BEHIND: bool = (
+        os.getenv("LIKES_WRITE_BEHIND", "false").lower() == "true"
+    )
+    LIKES_FLUSH_INTERVAL_MS: float = float(os.getenv("LIKES_FLUSH_INTERVAL_MS", 100))
+    LIKES_MAX_PENDING: int = int(os.getenv("LIKES_MAX_PENDING", 5000))
+    LIKES_JOURNAL_DIR: str = os.getenv("LIKES_JOURNAL_DIR")
+    LIKES_JOURNAL_FSYNC: bool = (
+        os.getenv("LIKES_JOURNAL_FSYNC", "false").lower() == "true"
+    )
+    # How long a read waits for the queued likes of its user
+    LIKES_WAIT_SECONDS: float = float(os.getenv("LIKES_WAIT_SECONDS", 5))
+    # Flushes of a like before it is dropped, retried with a growing delay
+    LIKES_MAX_ATTEMPTS: int = int(os.getenv("LIKES_MAX_ATTEMPTS", 10))
+
+    # Trending tweets, see db.repository.trending
+    TRENDING_MAX_SIZE: int = int(os.getenv("TRENDING_MAX_SIZE", 100))
+    TRENDING_CANDIDATES: int = int(os.getenv("TRENDING_CANDIDATES", 1000))
+    TRENDING_GRAVITY: float = float(os.getenv("TRENDING_GRAVITY", 1.8))
+    TRENDING_WINDOW_HOURS: float = float(os.getenv("TRENDING_WINDOW_HOURS", 48))
+    TRENDING_RESCORE_SECONDS: float = float(os.getenv("TRENDING_RESCORE_SECONDS", 60))
+
+    # Text search ranks the matches among the newest SEARCH_SCAN_ROWS tweets,
+    # SEARCH_MAX_CANDIDATES at most, see db.repository.search
+    SEARCH_MAX_CANDIDATES: int = int(os.getenv("SEARCH_MAX_CANDIDATES", 500))
+    SEARCH_SCAN_ROWS: int = int(os.getenv("SEARCH_SCAN_ROWS", 10000))
+
+    METRICS: bool = os.getenv("METRICS", "true").lower() == "true"
+
+    # Per request query count and database time, see core.middleware
+    QUERY_STATS: bool = os.getenv("QUERY_STATS", "false").lower() == "true"
+    QUERY_BUDGET: int = int(os.getenv("QUERY_BUDGET", 0))
+    QUERY_BUDGET_ENFORCE: bool = (
+        os.getenv("QUERY_BUDGET_ENFORCE", "false").lower() == "true"
+    )
+    QUERY_REPEAT_THRESHOLD: int = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))
+
+    # Sampling profiler, see core.profiler. Requests are profiled when they
+    # send X-Profile: PROFILER_TOKEN, when an admin asked for the next ones
+    # or at PROFILER_SAMPLE_RATE.
+    PROFILER: bool = os.getenv("PROFILER", "false").lower() == "true"
+    PROFILER_DIR: str = os.getenv("PROFILER_DIR", "/tmp/fast-tweet-profiles")
+    PROFILER_SAMPLE_RATE: float = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+    PROFILER_TOKEN: str = os.getenv("PROFILER_TOKEN")
+    PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+    PROFILER_MAX_OVERHEAD: float = float(os.getenv("PROFILER_MAX_OVERHEAD", 0.05))
+    PROFILER_MAX_DEPTH: int = int(os.getenv("PROFILER_MAX_DEPTH", 100))
+    PROFILER_MAX_FILE_BYTES: int = int(os.getenv("PROFILER_MAX_FILE_BYTES", 1000000))
+    PROFILER_MAX_FILES: int = int(os.getenv("PROFILER_MAX_FILES", 200))
 
 
 settings = Settings()
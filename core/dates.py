@@ -0,0 +1,6 @@
+from datetime import datetime, timezone
+
+
+def timestamp(moment: datetime) -> float:
+    """Seconds since the epoch of a naive UTC datetime, as the columns hold."""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
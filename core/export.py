@@ -0,0 +1,63 @@
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, Sequence
+
+import orjson
+
+
+FORMATS = ("ndjson", "csv")
+
+
+def encode_ndjson(rows: Iterable) -> Iterator[bytes]:
+    for row in rows:
+        yield orjson.dumps(
+            dict(row._mapping), default=str, option=orjson.OPT_APPEND_NEWLINE
+        )
+
+
+def encode_csv(rows: Iterable, columns: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_rows(rows: Iterable, columns: Sequence[str], fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        return encode_csv(rows, columns)
+    return encode_ndjson(rows)
+
+
+def batch_chunks(chunks: Iterable[bytes], min_chunk: int = 64 * 1024):
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= min_chunk:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def gzip_chunks(chunks: Iterable[bytes], min_chunk: int = 64 * 1024):
+    """Compress a stream of chunks on the fly as a single gzip member."""
+    compressor = zlib.compressobj(wbits=31)
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(compressor.compress(chunk))
+        size += len(pending[-1])
+        if size >= min_chunk:
+            yield b"".join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
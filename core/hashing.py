@@ -1,14 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
+from core.config import settings
+from core.metrics import password_hash_duration, password_verify_duration
+
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a thread pool is enough to keep hashing off the
+# request threads. The semaphore bounds running plus queued jobs.
+executor = ThreadPoolExecutor(
+    max_workers=settings.HASHER_WORKERS, thread_name_prefix="hasher"
+)
+pending = threading.BoundedSemaphore(settings.HASHER_MAX_PENDING)
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class HasherBusy(Exception):
+    pass
+
+
+def run_in_pool(func, *args):
+    if not pending.acquire(blocking=False):
+        raise HasherBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        pending.release()
 
 
 class Hasher:
     @staticmethod
     def verify_password(plain_password, hashed_password):
-        return pwd_context.verify(plain_password, hashed_password)
+        verify = password_verify_duration.time(pwd_context.verify)
+        return run_in_pool(verify, plain_password, hashed_password)
+
+    @staticmethod
+    def verify_and_update(plain_password, hashed_password):
+        """
+        Return (valid, new_hash). new_hash is set when the stored hash was
+        made with another work factor and must be replaced.
+        """
+        verify = password_verify_duration.time(pwd_context.verify_and_update)
+        return run_in_pool(verify, plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(password):
-        return pwd_context.hash(password)
+        return run_in_pool(password_hash_duration.time(pwd_context.hash), password)
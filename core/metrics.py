@@ -0,0 +1,173 @@
+"""
+Minimal metrics in the Prometheus text exposition format, no client library
+needed. Updates take one lock per metric, cheap enough to leave on.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, *labels: str, value: float):
+        """Mirror a value counted elsewhere, e.g. by the connection pool."""
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # one count per bucket, +Inf, then the sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, func: Callable, *labels: str) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - start, *labels)
+
+        return timed
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        lines = self.header()
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {counts[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], None]):
+        """Register `func` to refresh gauges right before each render."""
+        self.collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency by route template",
+        ("method", "route", "status"),
+    )
+)
+requests_in_progress = registry.register(
+    Gauge("http_requests_in_progress", "Requests being served", ("method",))
+)
+password_hash_duration = registry.register(
+    Histogram(
+        "password_hash_duration_seconds",
+        "Time spent hashing passwords with bcrypt",
+        buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 5),
+    )
+)
+password_verify_duration = registry.register(
+    Histogram(
+        "password_verify_duration_seconds",
+        "Time spent verifying passwords with bcrypt",
+        buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 5),
+    )
+)
+jwt_decode_failures = registry.register(
+    Counter(
+        "jwt_decode_failures_total",
+        "Access tokens rejected while decoding",
+        ("reason",),
+    )
+)
@@ -0,0 +1,208 @@
+import json
+import logging
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from core.metrics import request_duration, requests_in_progress
+from core.profiler import profiler
+from db.query_stats import QueryStats, current_stats
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope) -> str:
+    """
+    The path template of the matched route, e.g. /api/v1/tweets/{tweet_id}.
+    Included routers keep their routes unprefixed, so scope["route"].path_format
+    can be /{tweet_id}: the prefix is the part of the path before what the
+    route pattern matches. Unmatched paths share one label.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    path = scope["path"]
+    # the shortest match, route parameters do not span segments
+    ends = [len(path)] + [i for i in range(len(path) - 1, -1, -1) if path[i] == "/"]
+    for end in ends:
+        if route.path_regex.match(path[end:]):
+            return path[:end] + path_format
+    return path_format
+
+
+class MetricsMiddleware:
+    """
+    Record the latency of each request by method, route template (so
+    /tweets/{tweet_id} is one series whatever the id) and status, and the
+    number of requests in progress.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_progress.inc(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_progress.dec(method)
+            request_duration.observe(
+                time.perf_counter() - started,
+                method,
+                route_template(scope),
+                str(status),
+            )
+
+
+class QueryStatsMiddleware:
+    """
+    Count the SQL queries and database time of each request and report them
+    in a Server-Timing header and in the log. Statements repeated at least
+    `repeat_threshold` times are logged as N+1 suspects. When `budget` is set
+    requests over it are logged as errors, and with `enforce` the response is
+    replaced by a 500 so tests fail on them.
+
+    Queries run after the response started (streaming responses) are only
+    logged.
+    """
+
+    def __init__(
+        self, app, budget: int = 0, enforce: bool = False, repeat_threshold: int = 5
+    ):
+        self.app = app
+        self.budget = budget
+        self.enforce = enforce
+        self.repeat_threshold = repeat_threshold
+
+    def over_budget(self, stats: QueryStats) -> bool:
+        return bool(self.budget) and stats.count > self.budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        replaced = False
+
+        async def send_with_stats(message):
+            nonlocal replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                timing = (
+                    f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+                )
+                if self.enforce and self.over_budget(stats):
+                    replaced = True
+                    detail = f"Query budget exceeded: {stats.count} > {self.budget}"
+                    body = json.dumps({"detail": detail}).encode()
+                    await send(
+                        {
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [
+                                (b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"server-timing", timing.encode()),
+                            ],
+                        }
+                    )
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_stats.reset(token)
+            self.log(scope, stats, time.perf_counter() - started)
+
+    def log(self, scope, stats: QueryStats, elapsed: float):
+        request = f"{scope['method']} {scope['path']}"
+        fields = {
+            "path": scope["path"],
+            "query_count": stats.count,
+            "db_ms": round(stats.duration * 1000, 2),
+            "duration_ms": round(elapsed * 1000, 2),
+        }
+        logger.info(
+            "%s: %d queries, %.1f ms in the database",
+            request,
+            stats.count,
+            stats.duration * 1000,
+            extra=fields,
+        )
+        for statement, count in stats.repeated(self.repeat_threshold):
+            logger.warning(
+                "%s: possible N+1, %d times: %s",
+                request,
+                count,
+                statement,
+                extra={**fields, "repeated_count": count, "statement": statement},
+            )
+        if self.over_budget(stats):
+            logger.error(
+                "%s: %d queries, over the budget of %d",
+                request,
+                stats.count,
+                self.budget,
+                extra={**fields, "query_budget": self.budget},
+            )
+
+
+class ProfilerMiddleware:
+    """
+    Profile the requests chosen by `core.profiler.profiler` and tell the
+    client the profile file name in the X-Profile-File header. The profile
+    is written in the thread pool once the response is sent, outside the
+    sampling overhead cap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope["headers"]).get(b"x-profile")
+        if not profiler.should_profile(header and header.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        session = profiler.session(scope["method"], scope["path"])
+
+        async def send_with_name(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", session.name.encode())
+                ]
+            await send(message)
+
+        profiler.sampler.start(session)
+        try:
+            await self.app(scope, receive, send_with_name)
+        finally:
+            profiler.sampler.stop(session)
+            await run_in_threadpool(profiler.write, session)
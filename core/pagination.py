@@ -0,0 +1,48 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, UUID]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def encode_search_cursor(match: str, key, row_id: UUID) -> str:
+    """Cursor of a search page: the cursor mode, then its sort key and the id."""
+    key = key.isoformat() if isinstance(key, datetime) else repr(key)
+    raw = f"{match}|{key}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_search_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        match, key, row_id = raw.split("|", 2)
+        if match == "words":
+            key = float(key)
+        elif match in ("older", "substring"):
+            key = datetime.fromisoformat(key)
+        else:
+            raise ValueError(match)
+        return match, key, UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
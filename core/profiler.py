@@ -0,0 +1,168 @@
+"""
+Sampling profiler for individual requests. A background thread snapshots the
+stacks of the busy threads every few milliseconds while at least one profiled
+request is running, and each request writes its samples as collapsed stacks
+("frame;frame;frame count" lines, the input of flamegraph.pl and speedscope).
+
+The sampler sees every busy thread, so stacks of requests running at the same
+time as a profiled one end up in its profile too. PROFILER_MAX_OVERHEAD caps
+the sampling only: writing each profile, up to PROFILER_MAX_FILE_BYTES, takes
+a worker thread after the response was sent and is not counted.
+"""
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from core.config import settings
+
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+def code_name(code) -> str:
+    path = code.co_filename
+    for prefix in sys.path:
+        if prefix and path.startswith(prefix + os.sep):
+            path = path[len(prefix) + 1 :]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class Session:
+    def __init__(self, name: str):
+        self.name = name
+        self.stacks = Counter()
+
+
+class StackSampler:
+    """
+    Sample while sessions are open. After each sample the thread sleeps at
+    least `cost / max_overhead`, so sampling never takes more than
+    `max_overhead` of the time whatever the number of threads.
+    """
+
+    def __init__(self, interval: float, max_overhead: float, max_depth: int):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+        self.sessions = set()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, session: Session):
+        with self._lock:
+            self.sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profiler", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, session: Session):
+        with self._lock:
+            self.sessions.discard(session)
+
+    def sample(self, own_id: int) -> Counter:
+        stacks = Counter()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or frame.f_code.co_filename.endswith(IDLE_FILES):
+                continue
+            codes = []
+            while frame is not None and len(codes) < self.max_depth:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            stacks[tuple(codes)] += 1
+        return stacks
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self.sessions:
+                    self._thread = None
+                    return
+            started = time.perf_counter()
+            stacks = self.sample(own_id)
+            with self._lock:
+                for session in self.sessions:
+                    session.stacks.update(stacks)
+            cost = time.perf_counter() - started
+            time.sleep(max(self.interval, cost / self.max_overhead))
+
+
+class Profiler:
+    """Decide which requests are profiled and write their profiles."""
+
+    def __init__(self, directory: str, sample_rate: float, token: Optional[str]):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.next_requests = 0
+        self.sampler = StackSampler(
+            settings.PROFILER_INTERVAL_MS / 1000,
+            settings.PROFILER_MAX_OVERHEAD,
+            settings.PROFILER_MAX_DEPTH,
+        )
+        self._lock = threading.Lock()
+
+    def should_profile(self, header: Optional[str]) -> bool:
+        if (
+            self.token
+            and header
+            and hmac.compare_digest(header.encode(), self.token.encode())
+        ):
+            return True
+        with self._lock:
+            if self.next_requests > 0:
+                self.next_requests -= 1
+                return True
+        return random.random() < self.sample_rate
+
+    def session(self, method: str, path: str) -> Session:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        slug = "-".join(part for part in path.split("/") if part)[:80]
+        return Session(f"{stamp}-{method.lower()}-{slug or 'root'}.folded")
+
+    def write(self, session: Session):
+        """
+        Write the samples, most frequent stacks first, up to the size cap,
+        then drop the oldest files over the count cap.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        names = {}
+        size = 0
+        with open(os.path.join(self.directory, session.name), "w") as file:
+            for codes, count in session.stacks.most_common():
+                for code in codes:
+                    if code not in names:
+                        names[code] = code_name(code)
+                stack = ";".join(names[code] for code in reversed(codes))
+                line = f"{stack} {count}\n"
+                size += len(line)
+                if size > settings.PROFILER_MAX_FILE_BYTES:
+                    break
+                file.write(line)
+        self.prune()
+
+    def files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(it for it in os.listdir(self.directory) if it.endswith(".folded"))
+
+    def prune(self):
+        files = self.files()
+        for name in files[: max(len(files) - settings.PROFILER_MAX_FILES, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+profiler = Profiler(
+    settings.PROFILER_DIR, settings.PROFILER_SAMPLE_RATE, settings.PROFILER_TOKEN
+)
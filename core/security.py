@@ -1,20 +1,48 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 
+from core.cache import TTLCache
 from core.config import settings
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+# Tokens already verified, kept until they expire, so repeat callers skip
+# the HMAC check and the JSON parsing.
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
+
+def create_access_token(
+    data: dict, expires_delta: Optional[timedelta] = None, user=None
+):
     to_encode = data.copy()
+    if user is not None and settings.JWT_STATELESS_PRINCIPAL:
+        to_encode.update(
+            user_id=str(user.id),
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+        )
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """jwt.decode, skipped for tokens verified before and not expired yet."""
+    payload = token_cache.get(token)
+    if payload is not None and payload["exp"] > time.time():
+        return payload
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    if "exp" in payload:
+        token_cache.set(token, payload, ttl=payload["exp"] - time.time())
+    return payload
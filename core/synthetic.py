@@ -0,0 +1,125 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterator, Optional
+
+from core.hashing import Hasher
+
+SYLLABLES = ("ba", "ko", "ri", "ta", "mu", "le", "so", "vi", "na", "de", "go", "pe")
+
+
+class SyntheticDataset:
+    """
+    Deterministic fake users, tweets, follows and likes for load tests.
+
+    Every user gets a popularity weight of 1 / rank ** alpha (ranks are
+    shuffled), follow targets and liked authors are drawn with those weights,
+    so follower counts follow a power law: a few users have a large share of
+    the followers and most have almost none. Tweets are made of made-up words
+    with Zipf frequencies, so text search meets both common and rare terms.
+    Datasets must be consumed in order: users, tweets, follows, likes.
+    """
+
+    def __init__(
+        self,
+        users: int,
+        tweets_per_user: float = 10,
+        follows_per_user: float = 20,
+        likes_per_user: float = 20,
+        alpha: float = 1.2,
+        days: int = 90,
+        vocabulary: int = 5000,
+        password: str = "password",
+        seed: Optional[int] = None,
+    ):
+        self.random = random.Random(seed)
+        self.users_count = users
+        self.tweets_per_user = tweets_per_user
+        self.follows_per_user = follows_per_user
+        self.likes_per_user = likes_per_user
+        self.password = password
+        self.now = datetime.utcnow()
+        self.start = self.now - timedelta(days=days)
+        self.user_ids = [
+            uuid.UUID(int=self.random.getrandbits(128)) for _ in range(users)
+        ]
+        ranks = list(range(1, users + 1))
+        self.random.shuffle(ranks)
+        self.cum_weights = list(accumulate(1 / rank**alpha for rank in ranks))
+        self.tweet_ids = [[] for _ in range(users)]
+        words = {}
+        while len(words) < vocabulary:
+            length = self.random.randint(2, 4)
+            words["".join(self.random.choices(SYLLABLES, k=length))] = None
+        self.words = list(words)
+        self.word_weights = list(
+            accumulate(1 / rank for rank in range(1, vocabulary + 1))
+        )
+
+    def _count(self, mean: float, limit: int) -> int:
+        if mean <= 0:
+            return 0
+        return min(int(self.random.expovariate(1 / mean)), limit)
+
+    def _moment(self) -> datetime:
+        return self.start + (self.now - self.start) * self.random.random()
+
+    def _popular(self, k: int):
+        return self.random.choices(
+            range(self.users_count), cum_weights=self.cum_weights, k=k
+        )
+
+    def users(self) -> Iterator[Dict]:
+        hashed_password = Hasher.get_password_hash(self.password)
+        for index, user_id in enumerate(self.user_ids):
+            created_at = self._moment()
+            yield {
+                "id": str(user_id),
+                "email": f"user{index}@example.com",
+                "hashed_password": hashed_password,
+                "first_name": f"First{index}",
+                "last_name": f"Last{index}",
+                "birth_date": "1990-01-01",
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+    def tweets(self) -> Iterator[Dict]:
+        for index, user_id in enumerate(self.user_ids):
+            for _ in range(self._count(self.tweets_per_user, 1000)):
+                tweet_id = uuid.UUID(int=self.random.getrandbits(128))
+                self.tweet_ids[index].append(tweet_id)
+                created_at = self._moment()
+                yield {
+                    "id": str(tweet_id),
+                    "user_id": str(user_id),
+                    "content": " ".join(
+                        self.random.choices(
+                            self.words,
+                            cum_weights=self.word_weights,
+                            k=self.random.randint(4, 16),
+                        )
+                    ),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+
+    def follows(self) -> Iterator[Dict]:
+        for index, user_id in enumerate(self.user_ids):
+            count = self._count(self.follows_per_user, self.users_count - 1)
+            targets = set(self._popular(count)) - {index}
+            for target in targets:
+                yield {
+                    "user_id": str(user_id),
+                    "following_id": str(self.user_ids[target]),
+                }
+
+    def likes(self) -> Iterator[Dict]:
+        for user_id in self.user_ids:
+            liked = set()
+            for author in self._popular(self._count(self.likes_per_user, 1000)):
+                if self.tweet_ids[author]:
+                    liked.add(self.random.choice(self.tweet_ids[author]))
+            for tweet_id in liked:
+                yield {"user_id": str(user_id), "tweet_id": str(tweet_id)}
@@ -0,0 +1,293 @@
+"""
+Write-behind queue: a write is acknowledged as soon as it is queued and a
+background thread applies the queued writes in one batch every `interval`
+seconds. Only the last value queued for a key is kept, and a caller that
+knows the stored value passes it along: a write back to it cancels the
+queued one, so a like then an unlike never reaches the database.
+
+Failures. A batch that fails is queued again and retried with a growing
+delay, up to `max_attempts` times; meanwhile `wait_for` does not wait. The
+writes still failing then are dropped, counted, and appended to
+`{name}.dead` in the journal directory when there is one.
+
+Durability. Without a journal, the writes queued since the last flush are
+lost if the process dies, at most `interval` seconds of them plus the batch
+being applied; a clean shutdown flushes them. With a journal directory each
+write is appended to a file of the process before it is acknowledged, which
+survives a crash of the process, and a power loss too with `fsync`. The
+journal is rewritten with the writes still queued after each flush. A
+starting process replays the journals of the dead ones: each live process
+holds a lock on its own file.
+
+Read-your-writes. `wait_for(actor)` blocks until the writes queued by
+`actor` are applied. The queue is local to the process, so the other
+workers see the writes up to `interval` seconds later.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Hashable, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 30
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        name: str,
+        apply: Callable[[Dict[Hashable, object]], None],
+        interval: float,
+        max_pending: int,
+        journal_dir: Optional[str] = None,
+        fsync: bool = False,
+        wait_timeout: float = 5,
+        max_attempts: int = 10,
+    ):
+        self.name = name
+        self.apply = apply
+        self.interval = interval
+        self.max_pending = max_pending
+        self.journal_dir = journal_dir
+        self.fsync = fsync
+        self.wait_timeout = wait_timeout
+        self.max_attempts = max_attempts
+        self.pending = {}
+        self.attempts = {}
+        self.actors = set()
+        self.flushing = set()
+        self.batch = {}
+        self.flushed = 0
+        self.failures = 0
+        self.dropped = 0
+        self._failed_flushes = 0
+        self._journal = None
+        self._path = None
+        self._thread = None
+        self._wake = False
+        self._stopping = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            if self.journal_dir:
+                self._open_journal()
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Flush what is queued and stop the flusher thread."""
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        thread.join()
+        with self._cond:
+            self._thread = None
+            if self._journal is not None:
+                self._journal.close()
+                if not self.pending:
+                    os.remove(self._path)
+                self._journal = None
+
+    def put(self, key: Hashable, value, actor: str, stored=None):
+        """
+        Queue `value` for `key`; keys and values must be JSON serializable.
+        `stored` is the value of `key` in the database when the caller knows
+        it: writing it back cancels what is queued for `key`.
+        """
+        with self._cond:
+            if self._thread is None:
+                self.start()
+            self.attempts.pop(key, None)
+            # the batch being applied may change the stored value
+            if stored is not None and value == stored and key not in self.batch:
+                self.pending.pop(key, None)
+            else:
+                self.pending[key] = value
+                self.actors.add(actor)
+            if self._journal is not None:
+                # replaying the last value is right in both cases
+                self._append(self._journal, key, value)
+            if len(self.pending) >= self.max_pending and not self._failed_flushes:
+                self._wake = True
+                self._cond.notify_all()
+
+    def has_pending(self) -> bool:
+        return bool(self.actors or self.flushing)
+
+    def wait_for(self, actor: str) -> bool:
+        """
+        Flush now if `actor` has queued writes and wait until they are applied.
+        Return False when they are still queued after `wait_timeout`, or right
+        away while the flushes fail.
+        """
+
+        def applied():
+            return actor not in self.actors and actor not in self.flushing
+
+        with self._cond:
+            if applied():
+                return True
+            if self._failed_flushes:
+                return False
+            self._wake = True
+            self._cond.notify_all()
+            return self._cond.wait_for(applied, self.wait_timeout)
+
+    def flush(self) -> bool:
+        with self._cond:
+            if not self.pending:
+                return True
+            batch = self.batch = self.pending
+            self.pending = {}
+            self.flushing, self.actors = self.actors, set()
+        try:
+            self.apply(batch)
+        except Exception:
+            logger.exception("Could not apply %d queued %s", len(batch), self.name)
+            with self._cond:
+                for key, value in batch.items():
+                    # writes queued meanwhile are newer and win
+                    if key not in self.pending:
+                        self.pending[key] = value
+                        self.attempts[key] = self.attempts.get(key, 0) + 1
+                self.actors |= self.flushing
+                self.flushing = set()
+                self.batch = {}
+                self.failures += 1
+                self._failed_flushes += 1
+                self._drop_exhausted()
+                self._cond.notify_all()
+            return False
+        with self._cond:
+            for key in batch:
+                self.attempts.pop(key, None)
+            self.flushing = set()
+            self.batch = {}
+            self.flushed += len(batch)
+            self._failed_flushes = 0
+            if self._journal is not None:
+                self._rewrite_journal()
+            self._cond.notify_all()
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self.pending),
+                "flushed": self.flushed,
+                "failures": self.failures,
+                "dropped": self.dropped,
+            }
+
+    def _drop_exhausted(self):
+        dead = {
+            key: self.pending.pop(key)
+            for key, attempts in list(self.attempts.items())
+            if attempts >= self.max_attempts
+        }
+        if not dead:
+            return
+        for key in dead:
+            del self.attempts[key]
+        self.dropped += len(dead)
+        logger.error(
+            "Dropped %d %s after %d attempts", len(dead), self.name, self.max_attempts
+        )
+        if self.journal_dir:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            path = os.path.join(self.journal_dir, f"{self.name}.dead")
+            with open(path, "a") as file:
+                for key, value in dead.items():
+                    self._append(file, key, value)
+        if self._journal is not None:
+            self._rewrite_journal()
+        if not self.pending:
+            self.actors = set()
+
+    def _delay(self) -> float:
+        if not self._failed_flushes:
+            return self.interval
+        return min(self.interval * 2**self._failed_flushes, MAX_RETRY_DELAY)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._wake or self._stopping, self._delay())
+                self._wake = False
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def _append(self, file, key, value):
+        file.write(json.dumps([key, value]) + "\n")
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def _locked_file(self, path: str):
+        file = open(path, "a")
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return file
+
+    def _open_journal(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._path = os.path.join(
+            self.journal_dir, f"{self.name}-{os.getpid()}-{uuid4().hex[:8]}.journal"
+        )
+        self._journal = self._locked_file(self._path)
+        for name in sorted(os.listdir(self.journal_dir)):
+            path = os.path.join(self.journal_dir, name)
+            if name.endswith(".journal") and path != self._path:
+                self._replay(path)
+
+    def _replay(self, path: str):
+        try:
+            file = open(path)
+        except FileNotFoundError:
+            return
+        with file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # its process is alive
+            try:
+                if os.stat(path).st_ino != os.fstat(file.fileno()).st_ino:
+                    return  # replayed and removed by another process
+            except FileNotFoundError:
+                return
+            for line in file:
+                try:
+                    key, value = json.loads(line)
+                except ValueError:
+                    continue  # torn last line
+                self.pending[tuple(key) if isinstance(key, list) else key] = value
+            self._rewrite_journal()
+            os.remove(path)
+        logger.info("Replayed %s journal %s", self.name, path)
+
+    def _rewrite_journal(self):
+        """Replace the journal with the queued writes, locking the new file first."""
+        file = self._locked_file(self._path + ".tmp")
+        file.truncate(0)
+        for key, value in self.pending.items():
+            file.write(json.dumps([key, value]) + "\n")
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+        os.replace(self._path + ".tmp", self._path)
+        self._journal.close()
+        self._journal = file
@@ -1,2 +1,4 @@
 from db.base_class import Base
 from db.models.users import User
+from db.models.timelines import Timeline
+from db.models.tokens import RefreshToken, RevokedSubject
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+
+from db.base_class import Base
+
+
+class Timeline(Base):
+    user_id = Column(UUID(as_uuid=True), ForeignKey("user.id"), primary_key=True)
+    tweet_id = Column(UUID(as_uuid=True), ForeignKey("tweet.id"), primary_key=True)
+    author_id = Column(UUID(as_uuid=True), ForeignKey("user.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_timeline_user_id_created_at", "user_id", "created_at", "tweet_id"),
+        Index("ix_timeline_user_id_author_id", "user_id", "author_id"),
+    )
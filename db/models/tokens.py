@@ -0,0 +1,29 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, ForeignKey, String, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from db.base_class import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_token"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("user.id"), nullable=False, index=True
+    )
+    # Every token rotated from the same login shares the family
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    # sha256 of the token, the token itself is never stored
+    token_hash = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class RevokedSubject(Base):
+    __tablename__ = "revoked_subject"
+
+    subject = Column(String, primary_key=True)
+    revoked_at = Column(DateTime, nullable=False, index=True)
@@ -1,10 +1,24 @@
 import uuid
-from sqlalchemy import Boolean, Column, String, DateTime, func, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 
 from db.base_class import Base
 
+# text search configuration of content_tsv, queries must use the same one
+SEARCH_CONFIG = "english"
+
 
 class Tweet(Base):
     id = Column(
@@ -15,6 +29,14 @@ class Tweet(Base):
     )
     content = Column(String(250), nullable=False)
     is_active = Column(Boolean(), default=True)
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # kept up to date by Postgres on insert and update, never loaded
+    content_tsv = deferred(
+        Column(
+            TSVECTOR,
+            Computed(f"to_tsvector('{SEARCH_CONFIG}', content)", persisted=True),
+        )
+    )
     created_at = Column(
         DateTime,
         nullable=False,
@@ -29,6 +51,25 @@ class Tweet(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("user.id"), nullable=False)
     user = relationship("User", foreign_keys=[user_id], back_populates="tweets")
 
-    @property
-    def likes_count(self):
-        return len(self.likes)
+    __table_args__ = (
+        Index("ix_tweet_user_id_created_at", "user_id", "created_at"),
+        Index(
+            "ix_tweet_active_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+        Index(
+            "ix_tweet_content_tsv",
+            "content_tsv",
+            postgresql_using="gin",
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+        Index(
+            "ix_tweet_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+    )
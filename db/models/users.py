@@ -5,6 +5,8 @@ from sqlalchemy import (
     DateTime,
     Date,
     ForeignKey,
+    Index,
+    Integer,
     String,
     Table,
     func,
@@ -30,6 +32,8 @@ class User(Base):
     first_name = Column(String(256), nullable=False)
     last_name = Column(String(256), nullable=False)
     birth_date = Column(Date, nullable=True)
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(
         DateTime,
         nullable=False,
@@ -68,13 +72,7 @@ class User(Base):
         backref="likes",
     )
 
-    @property
-    def following_count(self):
-        return self.following.count()
-
-    @property
-    def followers_count(self):
-        return self.followers.count()
+    __table_args__ = (Index("ix_user_created_at_id", "created_at", "id"),)
 
 
 user_like_tweet = Table(
@@ -82,6 +80,7 @@ user_like_tweet = Table(
     Base.metadata,
     Column("user_id", UUID(as_uuid=True), ForeignKey("user.id"), primary_key=True),
     Column("tweet_id", UUID(as_uuid=True), ForeignKey("tweet.id"), primary_key=True),
+    Index("ix_user_like_tweet_tweet_id", "tweet_id", "user_id"),
 )
 
 
@@ -90,4 +89,5 @@ user_following = Table(
     Base.metadata,
     Column("user_id", UUID(as_uuid=True), ForeignKey(User.id), primary_key=True),
     Column("following_id", UUID(as_uuid=True), ForeignKey(User.id), primary_key=True),
+    Index("ix_user_following_following_id", "following_id", "user_id"),
 )
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def wait_stats(self) -> dict:
+        with self._stats_lock:
+            checkouts = self.checkouts
+            wait_total = self.wait_seconds_total
+            wait_max = self.wait_seconds_max
+        return {
+            "checkouts": checkouts,
+            "wait_seconds_total": wait_total,
+            "wait_seconds_max": wait_max,
+            "wait_seconds_avg": wait_total / checkouts if checkouts else 0.0,
+        }
+
+
+def pool_stats(pool) -> dict:
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            pool_size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.wait_stats())
+    return stats
@@ -0,0 +1,63 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+_PARAM = re.compile(r"(%\(\w+\)s|\$\d+)(::[\w\[\]]+)?")
+_LIST = re.compile(r"\?(\s*,\s*\?)+")
+_ROWS = re.compile(r"\(\?\)(\s*,\s*\(\?\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    The statement with its parameters, IN lists and VALUES rows collapsed, so
+    the same query with other values or list sizes gets the same fingerprint.
+    """
+    statement = _LIST.sub("?", _PARAM.sub("?", statement))
+    return _SPACES.sub(" ", _ROWS.sub("(?)", statement)).strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int):
+        """Statements run at least `threshold` times, the N+1 suspects."""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_stats", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    if stats is None or not conn.info.get("query_started_at"):
+        return
+    stats.record(statement, time.perf_counter() - conn.info["query_started_at"].pop())
+
+
+def track_queries(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+
+from db.models.tweets import Tweet
+
+
+async def get_tweet(db: AsyncSession, tweet_id: str):
+    result = await db.execute(
+        select(Tweet).options(joinedload(Tweet.user)).filter(Tweet.id == tweet_id)
+    )
+    return result.scalars().first()
+
+
+async def get_timeline_tweets(
+    db: AsyncSession, limit: int, before: Optional[Tuple[datetime, UUID]] = None
+):
+    query = (
+        select(Tweet)
+        .join(Tweet.user)
+        .options(contains_eager(Tweet.user))
+        .filter(Tweet.is_active.is_(True))
+        .order_by(Tweet.created_at.desc(), Tweet.id.desc())
+    )
+    if before:
+        query = query.filter(tuple_(Tweet.created_at, Tweet.id) < tuple_(*before))
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models.users import User
+from db.repository.users import LISTING_COLUMNS
+
+
+async def get_user(db: AsyncSession, user_id: str):
+    result = await db.execute(select(User).filter(User.id == user_id))
+    return result.scalars().first()
+
+
+async def get_users_page(
+    db: AsyncSession,
+    limit: int,
+    before: Optional[Tuple[datetime, UUID]] = None,
+    is_active: Optional[bool] = None,
+):
+    query = select(*LISTING_COLUMNS).order_by(User.created_at.desc(), User.id.desc())
+    if is_active is not None:
+        query = query.filter(User.is_active.is_(is_active))
+    if before:
+        query = query.filter(tuple_(User.created_at, User.id) < tuple_(*before))
+    result = await db.execute(query.limit(limit))
+    return result.all()
@@ -0,0 +1,133 @@
+import csv
+import io
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from core.hashing import Hasher
+
+
+# dataset: (table, columns, {column: referenced table})
+LOAD_TABLES = {
+    "users": (
+        "user",
+        [
+            "id",
+            "email",
+            "hashed_password",
+            "first_name",
+            "last_name",
+            "birth_date",
+            "is_active",
+            "is_superuser",
+            "created_at",
+            "updated_at",
+        ],
+        {},
+    ),
+    "tweets": (
+        "tweet",
+        ["id", "user_id", "content", "is_active", "created_at", "updated_at"],
+        {"user_id": "user"},
+    ),
+    "likes": (
+        "user_like_tweet",
+        ["user_id", "tweet_id"],
+        {"user_id": "user", "tweet_id": "tweet"},
+    ),
+    "follows": (
+        "user_following",
+        ["user_id", "following_id"],
+        {"user_id": "user", "following_id": "user"},
+    ),
+}
+# rows the API refuses, a user following themselves would get their own tweets
+# twice from fan_out_tweet and fail on the timeline primary key
+LOAD_CHECKS = {"follows": "stage.user_id <> stage.following_id"}
+
+
+def prepare_record(dataset: str, record: Dict) -> Dict:
+    record = {key: value for key, value in record.items() if value is not None}
+    if dataset in ("users", "tweets"):
+        now = datetime.utcnow()
+        record.setdefault("id", str(uuid.uuid4()))
+        record.setdefault("is_active", True)
+        record.setdefault("created_at", now)
+        record.setdefault("updated_at", record["created_at"])
+    if dataset == "users":
+        record["email"] = record["email"].lower()
+        record.setdefault("is_superuser", False)
+        if not record.get("hashed_password"):
+            if not record.get("password"):
+                raise ValueError(f"User {record['email']} has no password")
+            record["hashed_password"] = Hasher.get_password_hash(record["password"])
+    return record
+
+
+def _copy_batch(db: Session, dataset: str, records: List[Dict]) -> int:
+    table, columns, references = LOAD_TABLES[dataset]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        writer.writerow(record.get(column) for column in columns)
+    buffer.seek(0)
+
+    column_list = ", ".join(columns)
+    checks = " AND ".join(
+        [
+            f'EXISTS (SELECT 1 FROM "{target}" WHERE "{target}".id = stage.{column})'
+            for column, target in references.items()
+        ]
+        + ([LOAD_CHECKS[dataset]] if dataset in LOAD_CHECKS else [])
+    )
+    # created and dropped by the transaction of the batch, so the batch does
+    # not depend on getting the same connection back (NullPool, PgBouncer)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE bulk_stage ON COMMIT DROP AS "
+            f'SELECT {column_list} FROM "{table}" WITH NO DATA'
+        )
+        cursor.copy_expert(
+            f"COPY bulk_stage ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        cursor.execute(
+            f'INSERT INTO "{table}" ({column_list}) '
+            f"SELECT {column_list} FROM bulk_stage AS stage "
+            f"{'WHERE ' + checks if checks else ''} "
+            "ON CONFLICT DO NOTHING"
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def bulk_load(
+    db: Session, dataset: str, records: Iterable[Dict], batch_size: int = 50000
+):
+    """
+    Load records with COPY into a temporary staging table, then move the
+    rows whose foreign keys exist into the real table, one batch and one
+    transaction at a time. Returns (read, inserted); the difference are rows
+    with a missing reference, already loaded or users following themselves.
+    """
+    read = inserted = 0
+    batch = []
+    try:
+        for record in records:
+            batch.append(prepare_record(dataset, record))
+            if len(batch) >= batch_size:
+                inserted += _copy_batch(db, dataset, batch)
+                read += len(batch)
+                db.commit()
+                batch = []
+        if batch:
+            inserted += _copy_batch(db, dataset, batch)
+            read += len(batch)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return read, inserted
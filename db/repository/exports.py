@@ -0,0 +1,68 @@
+from sqlalchemy.orm import Session
+
+from core.export import batch_chunks, encode_rows, gzip_chunks
+from db.models.tweets import Tweet
+from db.models.users import User, user_following, user_like_tweet
+from db.session import SessionLocal
+
+
+EXPORT_COLUMNS = {
+    "users": (
+        User.id,
+        User.email,
+        User.first_name,
+        User.last_name,
+        User.birth_date,
+        User.is_active,
+        User.is_superuser,
+        User.created_at,
+        User.updated_at,
+    ),
+    "tweets": (
+        Tweet.id,
+        Tweet.user_id,
+        Tweet.content,
+        Tweet.is_active,
+        Tweet.likes_count,
+        Tweet.created_at,
+        Tweet.updated_at,
+    ),
+    "likes": (user_like_tweet.c.user_id, user_like_tweet.c.tweet_id),
+    "follows": (user_following.c.user_id, user_following.c.following_id),
+}
+
+
+def export_columns(dataset: str, password_hash: bool = False) -> tuple:
+    """
+    The columns of `dataset`, with the users' hashed_password when asked
+    for, so that commands.bulk_load can load the users back.
+    """
+    columns = EXPORT_COLUMNS[dataset]
+    if password_hash and dataset == "users":
+        columns += (User.hashed_password,)
+    return columns
+
+
+def iter_export_rows(db: Session, columns: tuple, batch_size: int = 1000):
+    """
+    Yield every row of `columns` through a server side cursor, holding at
+    most `batch_size` rows in memory.
+    """
+    query = db.query(*columns).execution_options(
+        stream_results=True, yield_per=batch_size
+    )
+    yield from query
+
+
+def stream_export(dataset: str, fmt: str, compress: bool, password_hash=False):
+    # Used from StreamingResponse, which outlives the request dependencies,
+    # so the generator owns its session
+    db = SessionLocal()
+    try:
+        columns = export_columns(dataset, password_hash)
+        chunks = encode_rows(
+            iter_export_rows(db, columns), [it.key for it in columns], fmt
+        )
+        yield from gzip_chunks(chunks) if compress else batch_chunks(chunks)
+    finally:
+        db.close()
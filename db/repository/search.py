@@ -0,0 +1,288 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, Text, and_, cast, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.orm import Session, contains_eager
+
+from core.config import settings
+from db.models.tweets import SEARCH_CONFIG, Tweet
+
+# shorter patterns have no trigram to look up and would scan the table
+SUBSTRING_MIN_LENGTH = 3
+# fetching a tweet through the GIN index of content_tsv, and of the
+# trigrams, costs about as much as walking this many tweets of the
+# created_at index, with the table in about created_at order as tweets are
+# appended
+GIN_FETCH_ROWS = 8
+TRIGRAM_FETCH_ROWS = 20
+# the phrase operators of a tsquery, <-> and <N>
+PHRASE_OPERATOR = r"<(-|\d+)>"
+# pg_trgm makes trigrams of the runs of letters and digits
+TRIGRAM_SEPARATORS = re.compile(r"[\W_]+")
+# the trigrams counted to estimate a substring fetch, the index narrows it
+# little past the first few
+MAX_TRIGRAMS = 8
+
+
+def _without_positions(query):
+    """`query` with its phrases as ANDs, what the GIN index can look up."""
+    return cast(
+        func.regexp_replace(cast(query, Text), PHRASE_OPERATOR, "&", "g"), TSQUERY
+    )
+
+
+def _contains(text: str):
+    text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return lambda it: it.content.ilike(f"%{text}%", escape="\\")
+
+
+def _with_users(db: Session):
+    return db.query(Tweet).join(Tweet.user).options(contains_eager(Tweet.user))
+
+
+def _with_tweets(db: Session, rows: list) -> list:
+    """(tweet, created_at) of the (id, created_at) `rows`, in their order."""
+    if not rows:
+        return []
+    ids = [it.id for it in rows]
+    tweets = {it.id: it for it in _with_users(db).filter(Tweet.id.in_(ids))}
+    return [
+        (tweets[it.id], it.created_at)
+        for it in rows
+        if it.id in tweets  # deactivated meanwhile
+    ]
+
+
+def _active(before: Optional[tuple]):
+    active = (
+        select(Tweet.id, Tweet.content, Tweet.content_tsv, Tweet.created_at)
+        .where(Tweet.is_active.is_(True))
+        .order_by(Tweet.created_at.desc(), Tweet.id.desc())
+    )
+    if before:
+        active = active.where(tuple_(Tweet.created_at, Tweet.id) < tuple_(*before))
+    return active
+
+
+def _recent_matches(db: Session, condition, limit: int, before: Optional[tuple]):
+    """(id, created_at) of the newest `limit` matches in the next SEARCH_SCAN_ROWS."""
+    recent = _active(before).limit(settings.SEARCH_SCAN_ROWS).subquery()
+    return db.execute(
+        select(recent.c.id, recent.c.created_at)
+        .where(condition(recent.c))
+        .order_by(recent.c.created_at.desc(), recent.c.id.desc())
+        .limit(limit)
+    ).all()
+
+
+def _recent_count(db: Session, condition, before: Optional[tuple]) -> int:
+    """The count of the matches in the next SEARCH_SCAN_ROWS."""
+    recent = _active(before).limit(settings.SEARCH_SCAN_ROWS).subquery()
+    return db.execute(
+        select(func.count()).select_from(recent).where(condition(recent.c))
+    ).scalar()
+
+
+def _scan_end(db: Session, before: Optional[tuple]) -> Optional[tuple]:
+    """(created_at, id) of the last of the next SEARCH_SCAN_ROWS, None if fewer."""
+    ends = _active(before).with_only_columns(Tweet.created_at, Tweet.id)
+    row = db.execute(ends.offset(settings.SEARCH_SCAN_ROWS - 1).limit(1)).first()
+    return tuple(row) if row else None
+
+
+def _words(db: Session, query):
+    """
+    The condition of `query` and the cost, in walked tweets, of fetching the
+    matches of the next SEARCH_SCAN_ROWS, `found` of them, through the GIN
+    index: it has no word positions, a phrase reads every tweet that has its
+    words.
+    """
+
+    def fetch_cost(found: int, before: Optional[tuple]) -> int:
+        if not found or not db.execute(
+            select(cast(query, Text).op("~")(PHRASE_OPERATOR))
+        ).scalar():
+            return GIN_FETCH_ROWS * found
+        loose = _without_positions(query)
+        return GIN_FETCH_ROWS * _recent_count(
+            db, lambda it: it.content_tsv.op("@@")(loose), before
+        )
+
+    return lambda it: it.content_tsv.op("@@")(query), fetch_cost
+
+
+def _substring(db: Session, text: str):
+    """
+    The condition of the tweets containing `text` and the cost, in walked
+    tweets, of fetching the matches of the next SEARCH_SCAN_ROWS, `found` of
+    them, through the trigram index: it reads every tweet that has the
+    trigrams of `text` anywhere.
+    """
+    trigrams = list(
+        dict.fromkeys(
+            part[i : i + 3].lower()
+            for part in TRIGRAM_SEPARATORS.split(text)
+            for i in range(len(part) - 2)
+        )
+    )[:MAX_TRIGRAMS]
+
+    def fetch_cost(found: int, before: Optional[tuple]) -> int:
+        if not found or trigrams == [text.lower()]:
+            return TRIGRAM_FETCH_ROWS * found
+        if not trigrams:
+            # the index reads every tweet
+            return TRIGRAM_FETCH_ROWS * settings.SEARCH_SCAN_ROWS
+        loose = [_contains(it) for it in trigrams]
+        return TRIGRAM_FETCH_ROWS * _recent_count(
+            db, lambda it: and_(*(like(it) for like in loose)), before
+        )
+
+    return _contains(text), fetch_cost
+
+
+def _newest_matches(
+    db: Session,
+    condition,
+    fetch_cost,
+    limit: int,
+    before: Optional[tuple],
+    walked: Optional[tuple] = None,
+):
+    """
+    (id, created_at) of the newest `limit` active tweets matching `condition`.
+
+    The planner guesses how many tweets match a tsquery or a pattern, badly
+    for phrases, words that go together and parts of words, and then walks
+    the created_at index far past rare matches or fetches every match of a
+    common query to sort them. So the next SEARCH_SCAN_ROWS tweets are walked
+    first, and the matches found there and what `fetch_cost` says fetching
+    them would have cost decide whether walking on or fetching the older
+    matches through their GIN index costs less. OFFSET 0 keeps the planner to
+    that choice. `walked` is (found, fetch cost) of the SEARCH_SCAN_ROWS
+    before `before` when the caller walked them already.
+    """
+    scan = settings.SEARCH_SCAN_ROWS
+    if walked:
+        rows, last = [], before
+        found, cost = walked
+    else:
+        rows = _recent_matches(db, condition, limit, before)
+        if len(rows) == limit:
+            return rows
+        last = _scan_end(db, before)
+        if last is None:
+            return rows  # walked them all
+        found = len(rows)
+        cost = fetch_cost(found, before)
+    # -1 or 0 until the table is first analyzed, the walk found more than that
+    tweets = max(
+        db.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = 'tweet'::regclass")
+        ).scalar(),
+        scan,
+    )
+    # rows left to walk, (limit - len(rows)) * scan / found, against the
+    # cost of the fetch, cost * tweets / scan
+    if (limit - len(rows)) * scan * scan < found * cost * tweets:
+        # no ORDER BY on top, it would sort the whole walk: the walk keeps the
+        # order of its subquery
+        walk = _active(last).offset(0).subquery()
+        page = select(walk.c.id, walk.c.created_at).where(condition(walk.c))
+    else:
+        fetch = (
+            select(Tweet.id, Tweet.created_at)
+            .where(
+                condition(Tweet),
+                Tweet.is_active.is_(True),
+                tuple_(Tweet.created_at, Tweet.id) < tuple_(*last),
+            )
+            .offset(0)
+            .subquery()
+        )
+        page = select(fetch).order_by(fetch.c.created_at.desc(), fetch.c.id.desc())
+    return rows + db.execute(page.limit(limit - len(rows))).all()
+
+
+def _match_words(
+    db: Session, query, candidates: list, limit: int, before: Optional[tuple]
+):
+    """(tweet, rank) of `candidates`, best first."""
+    # double precision so the rank round-trips exactly through the cursor
+    rank = cast(func.ts_rank_cd(Tweet.content_tsv, query), Float)
+    ranked = (
+        select(Tweet.id, rank.label("rank"))
+        .where(Tweet.id.in_([it.id for it in candidates]))
+        .subquery()
+    )
+    page = select(ranked).order_by(ranked.c.rank.desc(), ranked.c.id.desc())
+    if before:
+        page = page.where(tuple_(ranked.c.rank, ranked.c.id) < tuple_(*before))
+    page = page.limit(limit).subquery()
+    rows = (
+        _with_users(db)
+        .join(page, page.c.id == Tweet.id)
+        .add_columns(page.c.rank)
+        .order_by(page.c.rank.desc(), Tweet.id.desc())
+    )
+    return [(tweet, score) for tweet, score in rows]
+
+
+def search_tweets(
+    db: Session, text: str, limit: int, before: Optional[tuple] = None
+) -> Tuple[str, List[Tweet], Optional[tuple]]:
+    """
+    Return the match mode, the tweets of a page and the cursor of its last
+    tweet, (mode, sort key, id).
+
+    "words" matches the words of `text` in websearch syntax ("a phrase", or,
+    -word) through the GIN index of content_tsv. The matches among the newest
+    SEARCH_SCAN_ROWS tweets are ranked, best first, SEARCH_MAX_CANDIDATES at
+    most, and the older ones follow newest first (the "older" cursor). When
+    the first page finds nothing, e.g. for part of a word, the search falls
+    back to "substring": the tweets containing `text`, newest first, through
+    the trigram index.
+    `before` is a decoded search cursor and keeps its mode.
+    """
+    mode, key = (before[0], before[1:]) if before else ("words", None)
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, text)
+    condition, fetch_cost = _words(db, query)
+    rows, walked = [], None
+    if mode == "words":
+        # only the matches among the newest tweets are ranked: a common word
+        # matches too many tweets to rank them all on each page, and finding
+        # the newest matches of a rarer one can take long
+        candidates = _recent_matches(
+            db, condition, settings.SEARCH_MAX_CANDIDATES, None
+        )
+        if candidates:
+            words = _match_words(db, query, candidates, limit, key)
+            rows = [("words", *it) for it in words]
+        if len(rows) < limit:
+            if len(candidates) == settings.SEARCH_MAX_CANDIDATES:
+                key = (candidates[-1].created_at, candidates[-1].id)
+            else:
+                # the candidates are all the matches of the newest tweets
+                key = _scan_end(db, None)
+                if key:
+                    found = len(candidates)
+                    walked = (found, fetch_cost(found, None))
+            mode = "older" if key else None
+    if mode == "older":
+        older = _newest_matches(
+            db, condition, fetch_cost, limit - len(rows), key, walked
+        )
+        rows += [("older", *it) for it in _with_tweets(db, older)]
+    match = "words"
+    if mode == "substring" or not (rows or before):
+        match = "substring"
+        if mode != "substring":
+            key = None
+        if len(text) >= SUBSTRING_MIN_LENGTH:
+            contains, fetch_cost = _substring(db, text)
+            matches = _newest_matches(db, contains, fetch_cost, limit, key)
+            rows = [("substring", *it) for it in _with_tweets(db, matches)]
+    if not rows:
+        return match, [], None
+    last_mode, last, last_key = rows[-1]
+    return match, [tweet for _, tweet, _ in rows], (last_mode, last_key, last.id)
@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import DateTime, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from sqlalchemy.orm import Session, contains_eager
+
+from core.config import settings
+from db.models.timelines import Timeline
+from db.models.tweets import Tweet
+from db.models.users import User, user_following
+
+
+TIMELINE_COLUMNS = ["user_id", "tweet_id", "author_id", "created_at"]
+
+
+def is_fan_out_on_read(user: User):
+    """
+    Authors above FANOUT_MAX_FOLLOWERS are read from the tweet table instead
+    of being written to each follower's timeline. Their tweets of that time
+    are not in the timelines when they drop back below it, until
+    commands.rebuild_timelines is run.
+    """
+    return user.followers_count > settings.FANOUT_MAX_FOLLOWERS
+
+
+def fan_out_tweet(db: Session, tweet: Tweet):
+    db.add(
+        Timeline(
+            user_id=tweet.user_id,
+            tweet_id=tweet.id,
+            author_id=tweet.user_id,
+            created_at=tweet.created_at,
+        )
+    )
+    if is_fan_out_on_read(tweet.user):
+        return
+    followers = select(
+        user_following.c.user_id,
+        literal(tweet.id, PG_UUID(as_uuid=True)),
+        literal(tweet.user_id, PG_UUID(as_uuid=True)),
+        literal(tweet.created_at, DateTime),
+    ).where(user_following.c.following_id == tweet.user_id)
+    db.execute(insert(Timeline).from_select(TIMELINE_COLUMNS, followers))
+
+
+def backfill_timeline(db: Session, user_id: UUID, author_ids: List[UUID]):
+    if not author_ids:
+        return
+    ranked = (
+        select(
+            Tweet.id,
+            Tweet.user_id,
+            Tweet.created_at,
+            func.row_number()
+            .over(partition_by=Tweet.user_id, order_by=Tweet.created_at.desc())
+            .label("rank"),
+        )
+        .join(User, User.id == Tweet.user_id)
+        .where(
+            Tweet.user_id.in_(author_ids),
+            Tweet.is_active.is_(True),
+            User.followers_count <= settings.FANOUT_MAX_FOLLOWERS,
+        )
+        .subquery()
+    )
+    latest = select(
+        literal(user_id, PG_UUID(as_uuid=True)),
+        ranked.c.id,
+        ranked.c.user_id,
+        ranked.c.created_at,
+    ).where(ranked.c.rank <= settings.FANOUT_BACKFILL_TWEETS)
+    db.execute(
+        insert(Timeline).from_select(TIMELINE_COLUMNS, latest).on_conflict_do_nothing()
+    )
+
+
+def prune_timeline(db: Session, user_id: UUID, author_ids: List[UUID]):
+    if not author_ids:
+        return
+    db.query(Timeline).filter(
+        Timeline.user_id == user_id, Timeline.author_id.in_(author_ids)
+    ).delete(synchronize_session=False)
+
+
+def rebuild_timelines(db: Session):
+    """
+    Materialize every timeline from scratch, as fan_out_tweet and
+    backfill_timeline would have, for data loaded behind their back.
+    """
+    db.query(Timeline).delete(synchronize_session=False)
+    own = select(Tweet.user_id, Tweet.id, Tweet.user_id, Tweet.created_at)
+    db.execute(insert(Timeline).from_select(TIMELINE_COLUMNS, own))
+
+    ranked = (
+        select(
+            Tweet.id,
+            Tweet.user_id,
+            Tweet.created_at,
+            func.row_number()
+            .over(partition_by=Tweet.user_id, order_by=Tweet.created_at.desc())
+            .label("rank"),
+        )
+        .join(User, User.id == Tweet.user_id)
+        .where(
+            Tweet.is_active.is_(True),
+            User.followers_count <= settings.FANOUT_MAX_FOLLOWERS,
+        )
+        .subquery()
+    )
+    followed = (
+        select(
+            user_following.c.user_id,
+            ranked.c.id,
+            ranked.c.user_id,
+            ranked.c.created_at,
+        )
+        .join(ranked, ranked.c.user_id == user_following.c.following_id)
+        .where(ranked.c.rank <= settings.FANOUT_BACKFILL_TWEETS)
+    )
+    db.execute(
+        insert(Timeline)
+        .from_select(TIMELINE_COLUMNS, followed)
+        .on_conflict_do_nothing()
+    )
+    db.commit()
+
+
+def get_following_timeline(
+    db: Session,
+    user: User,
+    limit: int,
+    before: Optional[Tuple[datetime, UUID]] = None,
+):
+    fanned = (
+        db.query(Tweet)
+        .join(Timeline, Timeline.tweet_id == Tweet.id)
+        .join(Tweet.user)
+        .options(contains_eager(Tweet.user))
+        .filter(Timeline.user_id == user.id, Tweet.is_active.is_(True))
+        .order_by(Timeline.created_at.desc(), Timeline.tweet_id.desc())
+    )
+    if before:
+        fanned = fanned.filter(
+            tuple_(Timeline.created_at, Timeline.tweet_id) < tuple_(*before)
+        )
+
+    celebrities = (
+        select(user_following.c.following_id)
+        .join(User, User.id == user_following.c.following_id)
+        .where(
+            user_following.c.user_id == user.id,
+            User.followers_count > settings.FANOUT_MAX_FOLLOWERS,
+        )
+    )
+    pulled = (
+        db.query(Tweet)
+        .join(Tweet.user)
+        .options(contains_eager(Tweet.user))
+        .filter(Tweet.user_id.in_(celebrities), Tweet.is_active.is_(True))
+        .order_by(Tweet.created_at.desc(), Tweet.id.desc())
+    )
+    if before:
+        pulled = pulled.filter(tuple_(Tweet.created_at, Tweet.id) < tuple_(*before))
+
+    tweets = {}
+    for tweet in fanned.limit(limit).all() + pulled.limit(limit).all():
+        tweets[tweet.id] = tweet
+    ordered = sorted(
+        tweets.values(), key=lambda it: (it.created_at, it.id), reverse=True
+    )
+    return ordered[:limit]
@@ -0,0 +1,133 @@
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.dates import timestamp
+from db.models.tokens import RefreshToken, RevokedSubject
+from db.models.users import User
+
+
+def hash_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, a fast hash is enough
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_refresh_token(db: Session, user: User, family_id=None) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(
+        RefreshToken(
+            user_id=user.id,
+            family_id=family_id or uuid.uuid4(),
+            token_hash=hash_token(token),
+            expires_at=datetime.utcnow()
+            + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    )
+    db.commit()
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> Optional[Tuple[User, str]]:
+    """
+    Exchange a refresh token for a new one of the same family. Presenting a
+    token already rotated means it leaked, so its whole family is revoked.
+    """
+    now = datetime.utcnow()
+    row = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.token_hash == hash_token(token))
+        .with_for_update()
+        .first()
+    )
+    if row is None or row.expires_at <= now:
+        return None
+    if row.revoked_at is not None:
+        db.query(RefreshToken).filter(
+            RefreshToken.family_id == row.family_id,
+            RefreshToken.revoked_at.is_(None),
+        ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+        db.commit()
+        return None
+    user = db.query(User).filter(User.id == row.user_id).first()
+    if user is None or not user.is_active:
+        db.rollback()
+        return None
+    row.revoked_at = now
+    return user, create_refresh_token(db, user, row.family_id)
+
+
+class RevocationSet:
+    """
+    Subjects whose access tokens issued before `revoked_at` are refused,
+    held in a dict for O(1) checks. Rows are persisted in revoked_subject and
+    each process reloads them every `sync_seconds`, so a revocation reaches
+    every worker within that delay. Entries older than an access token
+    lifetime cannot match a live token and are dropped.
+    """
+
+    def __init__(self, sync_seconds: float):
+        self.sync_seconds = sync_seconds
+        self.revoked = {}
+        self.synced_at = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, db: Session, subject: str, issued_at: float) -> bool:
+        if (
+            self.synced_at is None
+            or time.monotonic() - self.synced_at > self.sync_seconds
+        ):
+            self.sync(db)
+        revoked_at = self.revoked.get(subject.lower())
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def add(self, subject: str, revoked_at: datetime):
+        self.revoked[subject.lower()] = timestamp(revoked_at)
+
+    def sync(self, db: Session):
+        # one thread reloads, the others keep using the current set
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            rows = db.query(RevokedSubject).filter(
+                RevokedSubject.revoked_at >= token_lifetime_start()
+            )
+            self.revoked = {row.subject: timestamp(row.revoked_at) for row in rows}
+            self.synced_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+
+def token_lifetime_start() -> datetime:
+    return datetime.utcnow() - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+revocations = RevocationSet(settings.REVOCATION_SYNC_SECONDS)
+
+
+def revoke_user_tokens(db: Session, user: User):
+    """Refuse the access tokens issued so far and revoke the refresh tokens."""
+    now = datetime.utcnow()
+    subject = user.email.lower()
+    db.execute(
+        insert(RevokedSubject)
+        .values(subject=subject, revoked_at=now)
+        .on_conflict_do_update(
+            index_elements=[RevokedSubject.subject], set_={"revoked_at": now}
+        )
+    )
+    db.query(RevokedSubject).filter(
+        RevokedSubject.revoked_at < token_lifetime_start()
+    ).delete(synchronize_session=False)
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user.id, RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    db.commit()
+    revocations.add(subject, now)
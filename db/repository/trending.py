@@ -0,0 +1,159 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List
+from uuid import UUID
+
+from sqlalchemy import event, func, literal
+from sqlalchemy.orm import Session, contains_eager
+
+from core.config import settings
+from core.dates import timestamp
+from db.models.tweets import Tweet
+
+
+class TrendingTweets:
+    """
+    The `capacity` best scored tweets of the last `window_hours`, scored
+    Hacker News style: likes / (age in hours + 2) ** gravity.
+
+    Likes update their tweet through `observe` with the counter written by the
+    same statement, once it is committed, and every `rescore_seconds` the
+    candidates are reloaded from tweet.likes_count, which brings the likes
+    written by the other workers and drops the tweets that aged out. Serving
+    the top never reads user_like_tweet.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        gravity: float,
+        window_hours: float,
+        rescore_seconds: float,
+    ):
+        self.capacity = capacity
+        self.gravity = gravity
+        self.window = window_hours * 3600
+        self.rescore_seconds = rescore_seconds
+        self.candidates = {}
+        self.floor = 0.0
+        self.rescored_at = None
+        self._lock = threading.Lock()
+        self._rescore_lock = threading.Lock()
+
+    def score(self, likes: int, created_at: float, now: float) -> float:
+        age_hours = max(now - created_at, 0) / 3600
+        return likes / (age_hours + 2) ** self.gravity
+
+    def observe(self, rows):
+        """Take the new counters from (id, likes_count, created_at) rows."""
+        now = time.time()
+        with self._lock:
+            for tweet_id, likes, created_at in rows:
+                created = timestamp(created_at)
+                if tweet_id in self.candidates or (
+                    now - created < self.window
+                    and self.score(likes, created, now) > self.floor
+                ):
+                    self.candidates[tweet_id] = (likes, created)
+            # trim once in a while rather than on every like
+            if len(self.candidates) > self.capacity * 5 // 4:
+                self._keep_best(now)
+
+    def discard(self, tweet_id: UUID):
+        with self._lock:
+            self.candidates.pop(tweet_id, None)
+
+    def top(self, db: Session, limit: int) -> List[UUID]:
+        if (
+            self.rescored_at is None
+            or time.monotonic() - self.rescored_at > self.rescore_seconds
+        ):
+            self.rescore(db)
+        now = time.time()
+        with self._lock:
+            items = list(self.candidates.items())
+        best = heapq.nlargest(limit, items, key=lambda it: self.score(*it[1], now))
+        return [tweet_id for tweet_id, _ in best]
+
+    def rescore(self, db: Session):
+        # one thread reloads, the others keep serving the current candidates
+        if not self._rescore_lock.acquire(blocking=False):
+            return
+        try:
+            now = datetime.utcnow()
+            age_hours = func.extract("epoch", literal(now) - Tweet.created_at) / 3600
+            rows = (
+                db.query(Tweet.id, Tweet.likes_count, Tweet.created_at)
+                .filter(
+                    Tweet.is_active.is_(True),
+                    Tweet.created_at >= now - timedelta(seconds=self.window),
+                    Tweet.likes_count > 0,
+                )
+                .order_by(
+                    (Tweet.likes_count / func.power(age_hours + 2, self.gravity)).desc()
+                )
+                .limit(self.capacity)
+            )
+            candidates = {
+                row.id: (row.likes_count, timestamp(row.created_at)) for row in rows
+            }
+            with self._lock:
+                self.candidates = candidates
+                self._keep_best(time.time())
+            self.rescored_at = time.monotonic()
+        finally:
+            self._rescore_lock.release()
+
+    def _keep_best(self, now: float):
+        scored = heapq.nlargest(
+            self.capacity,
+            (
+                (self.score(*value, now), tweet_id, value)
+                for tweet_id, value in self.candidates.items()
+            ),
+            key=lambda it: it[0],
+        )
+        self.candidates = {tweet_id: value for _, tweet_id, value in scored}
+        # below the floor a like cannot make a tweet enter a full set
+        self.floor = scored[-1][0] if len(scored) == self.capacity else 0.0
+
+
+trending = TrendingTweets(
+    settings.TRENDING_CANDIDATES,
+    settings.TRENDING_GRAVITY,
+    settings.TRENDING_WINDOW_HOURS,
+    settings.TRENDING_RESCORE_SECONDS,
+)
+
+
+def observe_after_commit(db: Session, rows):
+    """Pass the (id, likes_count, created_at) rows to `trending` once `db` commits."""
+    db.info.setdefault("trending", []).extend(rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _observe_committed(session: Session):
+    rows = session.info.pop("trending", None)
+    if rows:
+        trending.observe(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop("trending", None)
+
+
+def get_trending_tweets(db: Session, limit: int):
+    ranks = {tweet_id: rank for rank, tweet_id in enumerate(trending.top(db, limit))}
+    if not ranks:
+        return []
+    tweets = (
+        db.query(Tweet)
+        .join(Tweet.user)
+        .options(contains_eager(Tweet.user))
+        .filter(Tweet.id.in_(ranks), Tweet.is_active.is_(True))
+        .all()
+    )
+    return sorted(tweets, key=lambda it: ranks[it.id])
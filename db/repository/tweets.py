@@ -1,14 +1,28 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
 
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import delete, exists, func, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+
+from core.cache import response_cache, tweet_key
+from core.config import settings
+from core.write_behind import WriteBehindQueue
 from schemas.tweets import TweetCreate
 from db.models.tweets import Tweet
-from db.models.users import User
+from db.models.users import User, user_like_tweet
+from db.repository.timelines import fan_out_tweet
+from db.repository.trending import observe_after_commit, trending
+from db.session import SessionLocal
 
 
 def create_new_tweet(db: Session, tweet: TweetCreate, user: User):
     new_tweet = Tweet(content=tweet.content, user=user)
     db.add(new_tweet)
+    db.flush()
+    db.refresh(new_tweet)
+    fan_out_tweet(db, new_tweet)
     db.commit()
     db.refresh(new_tweet)
     return new_tweet
@@ -18,11 +32,18 @@ def get_tweet(db: Session, tweet_id: str):
     return db.query(Tweet).filter(Tweet.id == tweet_id).first()
 
 
+def invalidate_tweets(tweet_ids):
+    for tweet_id in tweet_ids:
+        response_cache.delete(tweet_key(tweet_id))
+
+
 def deactivate_tweet(db: Session, tweet_id: str):
     tweet = db.query(Tweet).filter(Tweet.id == tweet_id).first()
     tweet.is_active = False
     db.commit()
     db.refresh(tweet)
+    invalidate_tweets([tweet.id])
+    trending.discard(tweet.id)
 
 
 def update_content_tweet(db: Session, tweet: Tweet, content: str):
@@ -30,6 +51,7 @@ def update_content_tweet(db: Session, tweet: Tweet, content: str):
     tweet.updated_at = func.now()  # TODO Find way of update field automatically
     db.commit()
     db.refresh(tweet)
+    invalidate_tweets([tweet.id])
     return tweet
 
 
@@ -37,17 +59,209 @@ def get_all_tweets(db: Session):
     return db.query(Tweet).all()
 
 
-def mark_tweet_as_liked(db, tweet: Tweet, user: User):
-    liked_tweets = [str(it.id) for it in user.liked_tweets]
-    if str(tweet.id) in liked_tweets:
+def get_timeline_tweets(
+    db: Session, limit: int, before: Optional[Tuple[datetime, UUID]] = None
+):
+    query = (
+        db.query(Tweet)
+        .join(Tweet.user)
+        .options(contains_eager(Tweet.user))
+        .filter(Tweet.is_active.is_(True))
+        .order_by(Tweet.created_at.desc(), Tweet.id.desc())
+    )
+    if before:
+        query = query.filter(tuple_(Tweet.created_at, Tweet.id) < tuple_(*before))
+    return query.limit(limit).all()
+
+
+def get_existing_tweet_ids(db: Session, tweet_ids: List[UUID]):
+    if not tweet_ids:
+        return set()
+    return {row.id for row in db.query(Tweet.id).filter(Tweet.id.in_(tweet_ids))}
+
+
+def _lock_tweets(db: Session, tweet_ids: List[UUID]):
+    """Lock the counter rows in id order so overlapping bulk likes cannot deadlock."""
+    if len(tweet_ids) < 2:
         return
-    user.liked_tweets.append(tweet)
+    db.execute(
+        select(Tweet.id)
+        .where(Tweet.id.in_(tweet_ids))
+        .order_by(Tweet.id)
+        .with_for_update(key_share=True)
+    )
+
+
+def _update_likes_count(db: Session, changed, amount: int):
+    """
+    Apply `amount` per row returned by the `changed` DML CTE to the counter of
+    each tweet, so the edges and the counters are written by a single statement.
+    The new counters feed the trending tweets once committed.
+
+    updated_at is kept on purpose: it tracks content edits, as it did when a
+    like only wrote user_like_tweet, and the tweet and timeline ETags hash
+    likes_count instead.
+    """
+    counts = (
+        select(changed.c.tweet_id, func.count().label("rows"))
+        .group_by(changed.c.tweet_id)
+        .subquery()
+    )
+    result = db.execute(
+        update(Tweet)
+        .where(Tweet.id == counts.c.tweet_id)
+        .values(
+            likes_count=Tweet.likes_count + amount * counts.c.rows,
+            updated_at=Tweet.updated_at,
+        )
+        .returning(Tweet.id, Tweet.likes_count, Tweet.created_at)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    observe_after_commit(db, rows)
+    return [row.id for row in rows]
+
+
+def like_tweets(db: Session, user_id: UUID, tweet_ids: List[UUID]):
+    if not tweet_ids:
+        return []
+    liked = (
+        insert(user_like_tweet)
+        .values([{"user_id": user_id, "tweet_id": it} for it in tweet_ids])
+        .on_conflict_do_nothing()
+        .returning(user_like_tweet.c.tweet_id)
+        .cte("liked")
+    )
+    _lock_tweets(db, tweet_ids)
+    return _update_likes_count(db, liked, 1)
+
+
+def unlike_tweets(db: Session, user_id: UUID, tweet_ids: List[UUID]):
+    if not tweet_ids:
+        return []
+    unliked = (
+        delete(user_like_tweet)
+        .where(
+            user_like_tweet.c.user_id == user_id,
+            user_like_tweet.c.tweet_id.in_(tweet_ids),
+        )
+        .returning(user_like_tweet.c.tweet_id)
+        .cte("unliked")
+    )
+    _lock_tweets(db, tweet_ids)
+    return _update_likes_count(db, unliked, -1)
+
+
+def apply_likes(
+    db: Session, liked: List[Tuple[UUID, UUID]], unliked: List[Tuple[UUID, UUID]]
+):
+    """Like and unlike (user_id, tweet_id) pairs of several users at once."""
+    _lock_tweets(db, sorted({tweet_id for _, tweet_id in liked + unliked}))
+    changed = []
+    if liked:
+        inserted = (
+            insert(user_like_tweet)
+            .values([{"user_id": user, "tweet_id": tweet} for user, tweet in liked])
+            .on_conflict_do_nothing()
+            .returning(user_like_tweet.c.tweet_id)
+            .cte("liked")
+        )
+        changed += _update_likes_count(db, inserted, 1)
+    if unliked:
+        deleted = (
+            delete(user_like_tweet)
+            .where(
+                tuple_(user_like_tweet.c.user_id, user_like_tweet.c.tweet_id).in_(
+                    unliked
+                )
+            )
+            .returning(user_like_tweet.c.tweet_id)
+            .cte("unliked")
+        )
+        changed += _update_likes_count(db, deleted, -1)
+    return changed
+
+
+def flush_likes(batch: dict):
+    """Write a batch of the likes queue: the last state of each (user, tweet)."""
+    liked, unliked = [], []
+    for (user_id, tweet_id), state in batch.items():
+        (liked if state else unliked).append((UUID(user_id), UUID(tweet_id)))
+    db = SessionLocal()
+    try:
+        changed = apply_likes(db, liked, unliked)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_tweets(set(changed))
+
+
+likes_queue = WriteBehindQueue(
+    "likes",
+    flush_likes,
+    interval=settings.LIKES_FLUSH_INTERVAL_MS / 1000,
+    max_pending=settings.LIKES_MAX_PENDING,
+    journal_dir=settings.LIKES_JOURNAL_DIR,
+    fsync=settings.LIKES_JOURNAL_FSYNC,
+    wait_timeout=settings.LIKES_WAIT_SECONDS,
+    max_attempts=settings.LIKES_MAX_ATTEMPTS,
+)
+
+
+def is_liked(db: Session, user_id: UUID, tweet_id: UUID) -> bool:
+    return db.query(
+        exists().where(
+            user_like_tweet.c.user_id == user_id, user_like_tweet.c.tweet_id == tweet_id
+        )
+    ).scalar()
+
+
+def queue_like(db: Session, tweet: Tweet, user: User, state: bool):
+    # with the stored state a like then an unlike cancel out in the queue
+    likes_queue.put(
+        (str(user.id), str(tweet.id)),
+        state,
+        user.email.lower(),
+        stored=is_liked(db, user.id, tweet.id),
+    )
+
+
+def mark_tweet_as_liked(db, tweet: Tweet, user: User):
+    """
+    Return whether the tweet was not liked yet, or None with
+    LIKES_WRITE_BEHIND, where the like is only queued.
+    """
+    if settings.LIKES_WRITE_BEHIND:
+        return queue_like(db, tweet, user, True)
+    changed = like_tweets(db, user.id, [tweet.id])
     db.commit()
+    invalidate_tweets(changed)
+    return bool(changed)
 
 
 def mark_tweet_as_unliked(db, tweet: Tweet, user: User):
-    liked_tweets = [str(it.id) for it in user.liked_tweets]
-    if str(tweet.id) not in liked_tweets:
-        return
-    user.liked_tweets.remove(tweet)
+    if settings.LIKES_WRITE_BEHIND:
+        return queue_like(db, tweet, user, False)
+    changed = unlike_tweets(db, user.id, [tweet.id])
+    db.commit()
+    invalidate_tweets(changed)
+    return bool(changed)
+
+
+def reconcile_likes_count(db: Session):
+    likes = (
+        db.query(func.count(user_like_tweet.c.user_id))
+        .filter(user_like_tweet.c.tweet_id == Tweet.id)
+        .scalar_subquery()
+    )
+    updated = (
+        db.query(Tweet)
+        .filter(Tweet.likes_count != likes)
+        .update(
+            # a repaired counter is not a content edit, see _update_likes_count
+            {Tweet.likes_count: likes, Tweet.updated_at: Tweet.updated_at},
+            synchronize_session=False,
+        )
+    )
     db.commit()
+    return updated
@@ -1,8 +1,18 @@
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from schemas.users import UserRegister
 from db.models.users import User, user_following
+from core.cache import TTLCache, response_cache, user_key
+from core.config import settings
 from core.hashing import Hasher
+from db.repository.timelines import backfill_timeline, prune_timeline
+from db.repository.tokens import revoke_user_tokens
 
 
 def create_new_user(user: UserRegister, db: Session):
@@ -21,21 +31,107 @@ def create_new_user(user: UserRegister, db: Session):
     return new_user
 
 
+# Counters change on every follow, so they are left out of the snapshot and
+# loaded on access.
+PRINCIPAL_COLUMNS = [
+    column.key
+    for column in User.__table__.columns
+    if column.key not in ("following_count", "followers_count")
+]
+
+principal_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email.lower()).first()
 
 
+def update_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+def get_principal(db: Session, email: str):
+    email = email.lower()
+    snapshot = principal_cache.get(email)
+    if snapshot is None:
+        user = get_user_by_email(db, email)
+        if user is not None:
+            principal_cache.set(
+                email, {key: getattr(user, key) for key in PRINCIPAL_COLUMNS}
+            )
+        return user
+
+    return _attach_principal(db, snapshot)
+
+
+def get_principal_from_claims(db: Session, claims: dict):
+    """
+    Build the user from the claims of a verified token without reading the
+    row; the other columns are loaded only if a route touches them.
+    """
+    snapshot = {
+        "id": UUID(claims["user_id"]),
+        "email": claims["sub"],
+        "is_active": claims["is_active"],
+        "is_superuser": claims["is_superuser"],
+    }
+    return _attach_principal(db, snapshot)
+
+
+def _attach_principal(db: Session, snapshot: dict):
+    user = db.identity_map.get(db.identity_key(User, snapshot["id"]))
+    if user is None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        db.add(user)
+    return user
+
+
+def invalidate_principal(email: str):
+    principal_cache.delete(email.lower())
+
+
 def deactivate_user(db: Session, user_id: str):
     user = db.query(User).filter(User.id == user_id).first()
     user.is_active = False
     db.commit()
     db.refresh(user)
+    revoke_user_tokens(db, user)
+    invalidate_principal(user.email)
+    response_cache.delete(user_key(user.id))
 
 
 def get_all_users(db: Session):
     return db.query(User).all()
 
 
+LISTING_COLUMNS = (
+    User.id,
+    User.email,
+    User.first_name,
+    User.last_name,
+    User.birth_date,
+    User.created_at,
+)
+
+
+def get_users_page(
+    db: Session,
+    limit: int,
+    before: Optional[Tuple[datetime, UUID]] = None,
+    is_active: Optional[bool] = None,
+):
+    query = db.query(*LISTING_COLUMNS).order_by(User.created_at.desc(), User.id.desc())
+    if is_active is not None:
+        query = query.filter(User.is_active.is_(is_active))
+    if before:
+        query = query.filter(tuple_(User.created_at, User.id) < tuple_(*before))
+    return query.limit(limit).all()
+
+
 def get_user(db: Session, user_id: str):
     return db.query(User).filter(User.id == user_id).first()
 
@@ -45,20 +141,120 @@ def update_data_user(db: Session, user_id: str, user_data: dict):
     user.update(user_data)
     db.commit()
     db.refresh(user.first())
+    invalidate_principal(user.first().email)
+    response_cache.delete(user_key(user_id))
     return user.first()
 
 
+def _lock_users(db: Session, user_ids: List[UUID]):
+    """
+    Lock the counter rows in id order, so concurrent follows touching the
+    same users (A follows B while B follows A) cannot deadlock.
+    """
+    db.execute(
+        select(User.id)
+        .where(User.id.in_(user_ids))
+        .order_by(User.id)
+        .with_for_update(key_share=True)
+    )
+
+
+def _update_follow_counts(db: Session, user_id, changed, amount: int):
+    """
+    Apply `amount` to the followers of the users returned by the `changed`
+    DML CTE and to the following count of `user_id`.
+    """
+    result = db.execute(
+        update(User)
+        .where(User.id.in_(select(changed.c.following_id)))
+        .values(followers_count=User.followers_count + amount)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed_ids = [row.id for row in result]
+    if changed_ids:
+        db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(following_count=User.following_count + amount * len(changed_ids))
+        )
+    return changed_ids
+
+
+def get_existing_user_ids(db: Session, user_ids: List[UUID]):
+    if not user_ids:
+        return set()
+    return {row.id for row in db.query(User.id).filter(User.id.in_(user_ids))}
+
+
+def follow_users(db: Session, user: User, user_ids: List[UUID]):
+    if not user_ids:
+        return []
+    followed = (
+        insert(user_following)
+        .values([{"user_id": user.id, "following_id": it} for it in user_ids])
+        .on_conflict_do_nothing()
+        .returning(user_following.c.following_id)
+        .cte("followed")
+    )
+    _lock_users(db, [user.id, *user_ids])
+    changed_ids = _update_follow_counts(db, user.id, followed, 1)
+    backfill_timeline(db, user.id, changed_ids)
+    return changed_ids
+
+
+def unfollow_users(db: Session, user: User, user_ids: List[UUID]):
+    if not user_ids:
+        return []
+    unfollowed = (
+        delete(user_following)
+        .where(
+            user_following.c.user_id == user.id,
+            user_following.c.following_id.in_(user_ids),
+        )
+        .returning(user_following.c.following_id)
+        .cte("unfollowed")
+    )
+    _lock_users(db, [user.id, *user_ids])
+    changed_ids = _update_follow_counts(db, user.id, unfollowed, -1)
+    prune_timeline(db, user.id, changed_ids)
+    return changed_ids
+
+
 def follow_a_user(db: Session, user: User, user_id: str):
-    user_to_follow = db.query(User).filter(User.id == user_id).first()
-    user.following.append(user_to_follow)
+    follow_users(db, user, [UUID(user_id)])
     db.commit()
 
 
 def unfollow_a_user(db: Session, user: User, user_id: str):
-    user_to_follow = db.query(User).filter(User.id == user_id).first()
-    user.following.remove(user_to_follow)
+    unfollow_users(db, user, [UUID(user_id)])
     db.commit()
 
 
 def following_user(user: User, user_id: str):
     return user.following.filter(user_following.c.following_id == user_id).first()
+
+
+def reconcile_follow_counts(db: Session):
+    following = (
+        db.query(func.count(user_following.c.following_id))
+        .filter(user_following.c.user_id == User.id)
+        .scalar_subquery()
+    )
+    followers = (
+        db.query(func.count(user_following.c.user_id))
+        .filter(user_following.c.following_id == User.id)
+        .scalar_subquery()
+    )
+    updated = (
+        db.query(User)
+        .filter(
+            or_(User.following_count != following, User.followers_count != followers)
+        )
+        .update(
+            {User.following_count: following, User.followers_count: followers},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated
@@ -1,15 +1,54 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from typing import Generator
+from sqlalchemy.pool import NullPool
+from typing import AsyncGenerator, Generator
 
 from core.config import settings
+from db.pool import InstrumentedQueuePool
+
+
+def engine_options(async_driver: bool = False) -> dict:
+    if settings.DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+        if async_driver:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+            }
+        return options
+
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if not async_driver:
+        options["poolclass"] = InstrumentedQueuePool
+    return options
 
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DB_READS:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL, **engine_options(async_driver=True)
+    )
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
 
 def get_db() -> Generator:
     try:
@@ -17,3 +56,8 @@ def get_db() -> Generator:
         yield db_conn
     finally:
         db_conn.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db_conn:
+        yield db_conn
@@ -0,0 +1,65 @@
+"""Add denormalized counters
+
+Revision ID: 7a3c9e1f4b20
+Revises: 58413109476b
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7a3c9e1f4b20"
+down_revision = "58413109476b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "tweet",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "user",
+        sa.Column("following_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "user",
+        sa.Column("followers_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE tweet SET likes_count = counts.total
+        FROM (
+            SELECT tweet_id, count(*) AS total FROM user_like_tweet GROUP BY tweet_id
+        ) AS counts
+        WHERE tweet.id = counts.tweet_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE "user" SET following_count = counts.total
+        FROM (
+            SELECT user_id, count(*) AS total FROM user_following GROUP BY user_id
+        ) AS counts
+        WHERE "user".id = counts.user_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE "user" SET followers_count = counts.total
+        FROM (
+            SELECT following_id, count(*) AS total
+            FROM user_following GROUP BY following_id
+        ) AS counts
+        WHERE "user".id = counts.following_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("user", "followers_count")
+    op.drop_column("user", "following_count")
+    op.drop_column("tweet", "likes_count")
@@ -0,0 +1,86 @@
+"""Add timeline table
+
+Revision ID: b5d2f08e6c41
+Revises: 7a3c9e1f4b20
+Create Date: 2026-10-18 10:03:11.527316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = "b5d2f08e6c41"
+down_revision = "7a3c9e1f4b20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "timeline",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("tweet_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("author_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["author_id"],
+            ["user.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["tweet_id"],
+            ["tweet.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "tweet_id"),
+    )
+    op.create_index(
+        "ix_timeline_user_id_created_at",
+        "timeline",
+        ["user_id", "created_at", "tweet_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_timeline_user_id_author_id",
+        "timeline",
+        ["user_id", "author_id"],
+        unique=False,
+    )
+    # what fan_out_tweet and backfill_timeline would have written: every
+    # tweet in its author's timeline, and the latest FANOUT_BACKFILL_TWEETS
+    # of each author that fans out in their followers' timelines
+    op.execute(
+        """
+        INSERT INTO timeline (user_id, tweet_id, author_id, created_at)
+        SELECT user_id, id, user_id, created_at FROM tweet
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO timeline (user_id, tweet_id, author_id, created_at)
+        SELECT user_following.user_id, ranked.id, ranked.user_id, ranked.created_at
+        FROM user_following
+        JOIN (
+            SELECT tweet.id, tweet.user_id, tweet.created_at,
+                row_number() OVER (
+                    PARTITION BY tweet.user_id ORDER BY tweet.created_at DESC
+                ) AS rank
+            FROM tweet JOIN "user" ON "user".id = tweet.user_id
+            WHERE tweet.is_active IS TRUE
+                AND "user".followers_count <= {int(settings.FANOUT_MAX_FOLLOWERS)}
+        ) AS ranked ON ranked.user_id = user_following.following_id
+        WHERE ranked.rank <= {int(settings.FANOUT_BACKFILL_TWEETS)}
+        ON CONFLICT DO NOTHING
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_timeline_user_id_author_id", table_name="timeline")
+    op.drop_index("ix_timeline_user_id_created_at", table_name="timeline")
+    op.drop_table("timeline")
@@ -0,0 +1,61 @@
+"""Add hot path indexes
+
+Revision ID: d84e1a7c3f95
+Revises: b5d2f08e6c41
+Create Date: 2026-10-18 12:20:47.904133
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d84e1a7c3f95"
+down_revision = "b5d2f08e6c41"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_tweet_user_id_created_at", "tweet", ["user_id", "created_at"], None),
+    (
+        "ix_tweet_active_created_at_id",
+        "tweet",
+        ["created_at", "id"],
+        sa.text("is_active IS TRUE"),
+    ),
+    ("ix_user_created_at_id", "user", ["created_at", "id"], None),
+    ("ix_user_like_tweet_tweet_id", "user_like_tweet", ["tweet_id", "user_id"], None),
+    (
+        "ix_user_following_following_id",
+        "user_following",
+        ["following_id", "user_id"],
+        None,
+    ),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
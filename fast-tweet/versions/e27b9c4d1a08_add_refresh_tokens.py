@@ -0,0 +1,72 @@
+"""Add refresh_token and revoked_subject tables
+
+Revision ID: e27b9c4d1a08
+Revises: d84e1a7c3f95
+Create Date: 2026-10-18 11:48:02.416930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "e27b9c4d1a08"
+down_revision = "d84e1a7c3f95"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "refresh_token",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("family_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("token_hash"),
+    )
+    op.create_index(
+        op.f("ix_refresh_token_family_id"),
+        "refresh_token",
+        ["family_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_refresh_token_user_id"),
+        "refresh_token",
+        ["user_id"],
+        unique=False,
+    )
+    op.create_table(
+        "revoked_subject",
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("subject"),
+    )
+    op.create_index(
+        op.f("ix_revoked_subject_revoked_at"),
+        "revoked_subject",
+        ["revoked_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_revoked_subject_revoked_at"), table_name="revoked_subject")
+    op.drop_table("revoked_subject")
+    op.drop_index(op.f("ix_refresh_token_user_id"), table_name="refresh_token")
+    op.drop_index(op.f("ix_refresh_token_family_id"), table_name="refresh_token")
+    op.drop_table("refresh_token")
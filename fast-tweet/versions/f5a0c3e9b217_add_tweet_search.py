@@ -0,0 +1,68 @@
+"""Add tweet full-text and trigram search
+
+Revision ID: f5a0c3e9b217
+Revises: e27b9c4d1a08
+Create Date: 2026-10-18 13:52:31.270415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "f5a0c3e9b217"
+down_revision = "e27b9c4d1a08"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # a stored generated column rewrites the table under an exclusive lock,
+    # run it in a maintenance window on large tables
+    op.add_column(
+        "tweet",
+        sa.Column(
+            "content_tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('english', content)", persisted=True),
+            nullable=True,
+        ),
+    )
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tweet_content_tsv",
+            "tweet",
+            ["content_tsv"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("is_active IS TRUE"),
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_tweet_content_trgm",
+            "tweet",
+            ["content"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("is_active IS TRUE"),
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in ("ix_tweet_content_trgm", "ix_tweet_content_tsv"):
+            op.drop_index(
+                name,
+                table_name="tweet",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column("tweet", "content_tsv")
+    # pg_trgm stays installed, other objects of the database may use it
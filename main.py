@@ -1,16 +1,58 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 
 from apis.base import api_router
 from core.config import settings
+from core.middleware import (
+    MetricsMiddleware,
+    ProfilerMiddleware,
+    QueryStatsMiddleware,
+)
+from db.query_stats import track_queries
+from db.repository.tweets import likes_queue
+from db.session import async_engine, engine
 
 
 def include_router(app):
     app.include_router(api_router)
 
 
+def add_query_stats(app):
+    track_queries(engine)
+    if async_engine is not None:
+        track_queries(async_engine.sync_engine)
+    app.add_middleware(
+        QueryStatsMiddleware,
+        budget=settings.QUERY_BUDGET,
+        enforce=settings.QUERY_BUDGET_ENFORCE,
+        repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if settings.LIKES_WRITE_BEHIND:
+        # replays the journals left by dead processes
+        await run_in_threadpool(likes_queue.start)
+    yield
+    await run_in_threadpool(likes_queue.stop)
+
+
 def start_application():
-    app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.PROJECT_VERSION,
+        lifespan=lifespan,
+    )
     include_router(app)
+    if settings.QUERY_STATS:
+        add_query_stats(app)
+    if settings.PROFILER:
+        app.add_middleware(ProfilerMiddleware)
+    if settings.METRICS:
+        app.add_middleware(MetricsMiddleware)
     return app
 
 
@@ -0,0 +1,27 @@
+from enum import Enum
+from typing import List
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from core.config import settings
+
+
+class BulkIds(BaseModel):
+    ids: List[UUID] = Field(..., min_items=1, max_items=settings.BULK_MAX_ITEMS)
+
+
+class BulkStatus(str, Enum):
+    created = "created"
+    unchanged = "unchanged"
+    not_found = "not_found"
+    invalid = "invalid"
+
+
+class BulkItem(BaseModel):
+    id: UUID
+    status: BulkStatus
+
+
+class BulkResult(BaseModel):
+    results: List[BulkItem]
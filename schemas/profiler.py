@@ -0,0 +1,14 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ProfilerUpdate(BaseModel):
+    sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    next_requests: Optional[int] = Field(default=None, ge=0, le=1000)
+
+
+class ProfilerState(BaseModel):
+    sample_rate: float
+    next_requests: int
+    files: List[str]
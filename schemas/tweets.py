@@ -3,7 +3,7 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field
 
-from schemas.users import User
+from schemas.users import User, shape_user
 
 
 class Tweet(BaseModel):
@@ -18,5 +18,17 @@ class Tweet(BaseModel):
         orm_mode = True
 
 
+def shape_tweet(tweet) -> dict:
+    """Same fields as `Tweet`, see `schemas.users.shape_user`."""
+    return {
+        "id": str(tweet.id),
+        "content": tweet.content,
+        "created_at": tweet.created_at,
+        "updated_at": tweet.updated_at,
+        "user": shape_user(tweet.user),
+        "likes_count": tweet.likes_count,
+    }
+
+
 class TweetCreate(BaseModel):
     content: str = Field(..., min_length=1, max_length=250, example="My first tweet!")
@@ -35,3 +35,17 @@ class UserRegister(UserData, PasswordMixin):
 class UserDetail(User):
     following_count: int
     followers_count: int
+
+
+def shape_user(user) -> dict:
+    """
+    Same fields as `User` read straight from an ORM object or row, for the
+    fast JSON path that skips model validation.
+    """
+    return {
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "birth_date": user.birth_date,
+        "email": user.email,
+        "id": str(user.id),
+    }
@@ -0,0 +1,76 @@
+import os
+import uuid
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault(
+    "DATABASE_URL", "postgresql+psycopg2://postgres@localhost/postgres"
+)
+# a request over the budget answers 500, so an N+1 fails the test that hits it
+os.environ.setdefault("QUERY_STATS", "true")
+os.environ.setdefault("QUERY_BUDGET", "10")
+os.environ.setdefault("QUERY_BUDGET_ENFORCE", "true")
+
+PASSWORD = "password123"
+
+
+@pytest.fixture(scope="session")
+def database():
+    from sqlalchemy.exc import OperationalError
+
+    from db.session import engine
+
+    try:
+        engine.connect().close()
+    except OperationalError:
+        pytest.skip("no database at DATABASE_URL")
+    return engine
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db(database):
+    from db.session import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def signup(client):
+    """Sign up a new user; return its id, email and auth headers."""
+
+    def signup():
+        email = f"{uuid.uuid4().hex[:12]}@example.com"
+        response = client.post(
+            "/api/v1/auth/signup",
+            json={
+                "email": email,
+                "password": PASSWORD,
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+        assert response.status_code == 201, response.text
+        token = login(client, email).json()["access_token"]
+        return response.json()["id"], email, {"Authorization": f"Bearer {token}"}
+
+    return signup
+
+
+def login(client, email: str, password: str = PASSWORD):
+    return client.post(
+        "/api/v1/auth/login", data={"username": email, "password": password}
+    )
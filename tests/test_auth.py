@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta
+
+from db.models.tokens import RefreshToken
+from db.models.users import User
+from db.repository.tokens import (
+    RevocationSet,
+    hash_token,
+    revocations,
+    revoke_user_tokens,
+)
+from db.repository.users import deactivate_user
+from tests.conftest import login
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def me(client, access_token: str):
+    return client.get(
+        "/api/v1/users/me", headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+
+def test_login(client, signup):
+    _, email, _ = signup()
+    response = login(client, email)
+    assert response.status_code == 200
+    assert response.json()["refresh_token"]
+
+
+def test_login_after_deactivation(client, signup, db):
+    user_id, email, _ = signup()
+    refresh_token = login(client, email).json()["refresh_token"]
+    deactivate_user(db, user_id)
+
+    response = login(client, email)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Incorrect username or password"
+    assert refresh(client, refresh_token).status_code == 401
+
+
+def test_refresh_rotates_the_token(client, signup):
+    _, email, _ = signup()
+    first = login(client, email).json()["refresh_token"]
+
+    response = refresh(client, first)
+    assert response.status_code == 200
+    tokens = response.json()
+    assert tokens["refresh_token"] != first
+    assert me(client, tokens["access_token"]).json()["email"] == email
+    assert refresh(client, tokens["refresh_token"]).status_code == 200
+
+
+def test_reused_refresh_token_revokes_its_family(client, signup):
+    _, email, _ = signup()
+    first = login(client, email).json()["refresh_token"]
+    other_login = login(client, email).json()["refresh_token"]
+    second = refresh(client, first).json()["refresh_token"]
+
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, second).status_code == 401
+    assert refresh(client, other_login).status_code == 200
+
+
+def test_refresh_expired_or_of_inactive_user(client, signup, db):
+    user_id, email, _ = signup()
+    expired = login(client, email).json()["refresh_token"]
+    db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_token(expired)
+    ).update({RefreshToken.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert refresh(client, expired).status_code == 401
+
+    # deactivated behind deactivate_user's back, the refresh token is live
+    refresh_token = login(client, email).json()["refresh_token"]
+    db.query(User).filter(User.id == user_id).update({User.is_active: False})
+    db.commit()
+    assert refresh(client, refresh_token).status_code == 401
+
+
+def test_deactivation_refuses_issued_access_tokens(client, signup, db, monkeypatch):
+    user_id, email, headers = signup()
+    access_token = headers["Authorization"].split()[1]
+    assert me(client, access_token).status_code == 200
+    monkeypatch.setattr(revocations, "sync_seconds", 3600)
+
+    deactivate_user(db, user_id)
+    response = me(client, access_token)
+    assert response.status_code == 401
+    # refused from the in-memory set, no query
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+
+
+def test_revocation_reaches_other_processes(signup, db):
+    user_id, email, _ = signup()
+    # another worker, reloading the revoked subjects on each check
+    other = RevocationSet(sync_seconds=0)
+    issued_at = time.time() - 1
+    assert not other.is_revoked(db, email, issued_at)
+
+    revoke_user_tokens(db, db.get(User, user_id))
+    assert other.is_revoked(db, email.upper(), issued_at)
+    assert not other.is_revoked(db, email, time.time() + 1)
+    live = db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None)
+    )
+    assert live.count() == 0
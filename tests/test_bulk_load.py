@@ -0,0 +1,70 @@
+import json
+import uuid
+
+import psycopg2
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.repository.bulk_load import bulk_load
+from db.repository.exports import stream_export
+
+
+@pytest.fixture
+def null_pool_db(database):
+    # every checkout is a new connection, as behind PgBouncer
+    engine = create_engine(database.url, poolclass=NullPool)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def users(count: int):
+    return [
+        {
+            "email": f"{uuid.uuid4().hex[:12]}@example.com",
+            "hashed_password": "not-a-hash",
+            "first_name": "Bulk",
+            "last_name": "Load",
+        }
+        for _ in range(count)
+    ]
+
+
+def test_batches_with_null_pool(null_pool_db):
+    records = users(5)
+    assert bulk_load(null_pool_db, "users", records, batch_size=2) == (5, 5)
+    assert bulk_load(null_pool_db, "users", records, batch_size=2) == (5, 0)
+
+
+def test_failed_batch_rolls_back(null_pool_db):
+    (user,) = users(1)
+    tweets = [{"user_id": "not-a-uuid", "content": "x"}]
+    with pytest.raises(psycopg2.DataError):
+        bulk_load(null_pool_db, "tweets", tweets)
+    assert bulk_load(null_pool_db, "users", [user]) == (1, 1)
+
+
+def test_load_exported_users(client, signup, null_pool_db):
+    _, email, _ = signup()
+    lines = b"".join(stream_export("users", "ndjson", False, True)).splitlines()
+    (record,) = [it for it in map(json.loads, lines) if it["email"] == email]
+    assert record["hashed_password"]
+    assert bulk_load(null_pool_db, "users", [record]) == (1, 0)
+
+    lines = b"".join(stream_export("users", "ndjson", False)).splitlines()
+    assert "hashed_password" not in json.loads(lines[0])
+
+
+def test_self_follows_are_skipped(client, signup, null_pool_db):
+    user_id, _, headers = signup()
+    other_id, _, _ = signup()
+    follows = [
+        {"user_id": user_id, "following_id": user_id},
+        {"user_id": user_id, "following_id": other_id},
+    ]
+    assert bulk_load(null_pool_db, "follows", follows) == (2, 1)
+    response = client.post("/api/v1/tweets", json={"content": "hi"}, headers=headers)
+    assert response.status_code == 201, response.text
@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+
+import pytest
+
+from core.cache import ReadThroughCache, TTLCache, tweet_key
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_get_or_load_async_loads_once():
+    cache = ReadThroughCache(TTLCache(10, 60))
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_load_async("key", loader) for _ in range(5))
+        )
+
+    assert run(main()) == [{"id": 1}] * 5
+    assert calls == [1]
+    assert cache.get("key") == {"id": 1}
+
+
+def test_get_or_load_async_shares_errors():
+    cache = ReadThroughCache(TTLCache(10, 60))
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    async def loader():
+        return "value"
+
+    async def main():
+        results = await asyncio.gather(
+            *(cache.get_or_load_async("key", failing) for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(it, RuntimeError) for it in results)
+        return await cache.get_or_load_async("key", loader)
+
+    assert run(main()) == "value"
+
+
+def test_get_or_load_async_survives_cancelled_leader():
+    cache = ReadThroughCache(TTLCache(10, 60))
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def loader():
+        return "value"
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_load_async("key", slow))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_load_async("key", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await waiter
+
+    assert run(main()) == "value"
+
+
+def test_tweet_key_is_canonical():
+    tweet_id = uuid.uuid4()
+    spellings = [str(tweet_id), str(tweet_id).upper(), tweet_id.hex, f"{{{tweet_id}}}"]
+    assert {tweet_key(it) for it in spellings} == {tweet_key(tweet_id)}
+    with pytest.raises(ValueError):
+        tweet_key("not-a-uuid")
+
+
+def test_show_tweet_by_any_spelling(client, signup):
+    _, _, headers = signup()
+    response = client.post("/api/v1/tweets", json={"content": "hi"}, headers=headers)
+    tweet_id = response.json()["id"]
+    url = f"/api/v1/tweets/{tweet_id.upper()}"
+    assert client.get(url).json()["likes_count"] == 0
+    client.post(f"/api/v1/tweets/{tweet_id}/like", headers=headers)
+    assert client.get(url).json()["likes_count"] == 1
+    assert client.get("/api/v1/tweets/not-a-uuid").status_code == 404
+
+
+def test_show_user_by_any_spelling(client, signup):
+    user_id, _, _ = signup()
+    response = client.get(f"/api/v1/users/{user_id.upper()}")
+    assert response.json()["id"] == user_id
+    assert client.get("/api/v1/users/not-a-uuid").status_code == 404
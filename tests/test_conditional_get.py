@@ -0,0 +1,82 @@
+from db.repository.users import update_data_user
+
+# only If-None-Match is honoured, a date in the future must not give a 304
+FUTURE = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+
+def create_tweet(client, headers) -> str:
+    response = client.post("/api/v1/tweets", json={"content": "hi"}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def revalidate(client, url: str, etag: str):
+    by_etag = client.get(url, headers={"If-None-Match": etag})
+    by_date = client.get(url, headers={"If-Modified-Since": FUTURE})
+    return by_etag, by_date
+
+
+def test_tweet_not_modified(client, signup):
+    _, _, headers = signup()
+    url = f"/api/v1/tweets/{create_tweet(client, headers)}"
+    response = client.get(url)
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_tweet_after_like(client, signup):
+    _, _, headers = signup()
+    url = f"/api/v1/tweets/{create_tweet(client, headers)}"
+    etag = client.get(url).headers["etag"]
+    assert client.post(f"{url}/like", headers=headers).status_code == 204
+
+    by_etag, by_date = revalidate(client, url, etag)
+    assert by_etag.status_code == 200
+    assert by_etag.json()["likes_count"] == 1
+    assert by_etag.headers["etag"] != etag
+    assert by_date.status_code == 200
+
+
+def test_timeline_after_like(client, signup):
+    _, _, headers = signup()
+    tweet_id = create_tweet(client, headers)
+    url = "/api/v1/home?limit=5"
+    etag = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert (
+        client.post(f"/api/v1/tweets/{tweet_id}/like", headers=headers).status_code
+        == 204
+    )
+
+    by_etag, by_date = revalidate(client, url, etag)
+    assert by_etag.status_code == 200
+    assert by_date.status_code == 200
+    assert "last-modified" not in by_etag.headers
+
+
+def test_timeline_after_deactivation(client, signup):
+    _, _, headers = signup()
+    tweet_id = create_tweet(client, headers)
+    url = "/api/v1/home?limit=5"
+    etag = client.get(url).headers["etag"]
+    assert (
+        client.delete(f"/api/v1/tweets/{tweet_id}", headers=headers).status_code == 204
+    )
+
+    by_etag, by_date = revalidate(client, url, etag)
+    assert by_etag.status_code == 200
+    assert tweet_id not in [it["id"] for it in by_etag.json()]
+    assert by_date.status_code == 200
+
+
+def test_timeline_after_author_change(client, signup, db):
+    user_id, _, headers = signup()
+    create_tweet(client, headers)
+    url = "/api/v1/home?limit=5"
+    etag = client.get(url).headers["etag"]
+    update_data_user(db, user_id, {"first_name": "Renamed"})
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["user"]["first_name"] == "Renamed"
@@ -0,0 +1,149 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from core.synthetic import SyntheticDataset
+from db.base import Base
+from db.models.users import User, user_following, user_like_tweet
+from db.repository.bulk_load import bulk_load
+from db.repository.search import search_tweets
+from db.repository.timelines import get_following_timeline, rebuild_timelines
+from db.repository.tweets import get_timeline_tweets, reconcile_likes_count
+from db.repository.users import (
+    get_user_by_email,
+    get_users_page,
+    reconcile_follow_counts,
+)
+
+# the plans are checked under the default planner settings, against a
+# synthetic dataset analyzed in a schema of its own so that what the other
+# tests left does not change them
+SCHEMA = "test_indexes"
+
+
+def followers_of(db):
+    return (
+        db.query(user_following.c.user_id)
+        .filter(user_following.c.following_id == uuid4())
+        .all()
+    )
+
+
+def likers_of(db):
+    return (
+        db.query(user_like_tweet.c.user_id)
+        .filter(user_like_tweet.c.tweet_id == uuid4())
+        .all()
+    )
+
+
+CURSOR = (datetime.utcnow(), uuid4())
+
+CHECKS = {
+    "home timeline": (
+        lambda db: get_timeline_tweets(db, 20, CURSOR),
+        {"ix_tweet_active_created_at_id"},
+    ),
+    "following timeline": (
+        lambda db: get_following_timeline(db, User(id=uuid4()), 20, CURSOR),
+        {"ix_timeline_user_id_created_at"},
+    ),
+    "users page": (
+        lambda db: get_users_page(db, 20, CURSOR),
+        {"ix_user_created_at_id"},
+    ),
+    "user by email": (
+        lambda db: get_user_by_email(db, "nobody@example.com"),
+        {"ix_user_email"},
+    ),
+    # matches no word, so the substring fallback runs too
+    "tweet search": (
+        lambda db: search_tweets(db, "nothing matches", 20),
+        {
+            "ix_tweet_active_created_at_id",
+            "ix_tweet_content_tsv",
+            "ix_tweet_content_trgm",
+        },
+    ),
+    "followers of a user": (followers_of, {"ix_user_following_following_id"}),
+    "likers of a tweet": (likers_of, {"ix_user_like_tweet_tweet_id"}),
+}
+
+
+@pytest.fixture(scope="module")
+def indexed_db(database):
+    with database.connect() as connection:
+        if not connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first():
+            pytest.skip("pg_trgm is not installed")
+    engine = create_engine(
+        database.url, connect_args={"options": f"-c search_path={SCHEMA},public"}
+    )
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # the tables of public are visible too, do not mistake them for these
+    Base.metadata.create_all(engine, checkfirst=False)
+    db = sessionmaker(bind=engine)()
+    dataset = SyntheticDataset(
+        2000, tweets_per_user=25, follows_per_user=5, likes_per_user=10, seed=0
+    )
+    for name in ("users", "tweets", "follows", "likes"):
+        bulk_load(db, name, getattr(dataset, name)())
+    reconcile_likes_count(db)
+    reconcile_follow_counts(db)
+    rebuild_timelines(db)
+    db.execute(text("ANALYZE"))
+    db.commit()
+    yield db
+    db.close()
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+def capture(db, check):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", record)
+    try:
+        check(db)
+    finally:
+        event.remove(connection, "before_cursor_execute", record)
+    return statements
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@pytest.mark.parametrize("name", CHECKS)
+def test_query_uses_its_index(indexed_db, name):
+    check, expected = CHECKS[name]
+    used, seq_scans = set(), set()
+    for statement, parameters in capture(indexed_db, check):
+        cursor = indexed_db.connection().connection.cursor()
+        try:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0][0]["Plan"]
+        finally:
+            cursor.close()
+        for node in plan_nodes(plan):
+            if node["Node Type"] == "Seq Scan":
+                seq_scans.add(node["Relation Name"])
+            if "Index Name" in node:
+                used.add(node["Index Name"])
+    indexed_db.rollback()
+    assert expected <= used
+    assert not seq_scans
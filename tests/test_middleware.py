@@ -0,0 +1,41 @@
+import uuid
+
+from fastapi.routing import APIRoute
+
+from core.middleware import route_template
+
+
+def endpoint():
+    pass
+
+
+def scope(route_path: str, path: str) -> dict:
+    return {"route": APIRoute(route_path, endpoint), "path": path}
+
+
+def test_prefix_of_included_router():
+    assert (
+        route_template(scope("/{tweet_id}/like", "/api/v1/tweets/tweets/like"))
+        == "/api/v1/tweets/{tweet_id}/like"
+    )
+    assert route_template(scope("", "/api/v1/users")) == "/api/v1/users"
+    assert route_template(scope("/trending", "/api/v1/tweets/trending")) == (
+        "/api/v1/tweets/trending"
+    )
+
+
+def test_flattened_route():
+    route_path = "/api/v1/tweets/{tweet_id}"
+    assert route_template(scope(route_path, "/api/v1/tweets/1")) == route_path
+
+
+def test_unmatched():
+    assert route_template({"path": "/nope"}) == "unmatched"
+
+
+def test_metrics_use_route_templates(client):
+    client.get(f"/api/v1/tweets/{uuid.uuid4()}")
+    client.get("/api/v1/users?limit=1")
+    metrics = client.get("/api/v1/metrics").text
+    assert 'route="/api/v1/tweets/{tweet_id}"' in metrics
+    assert 'route="/api/v1/users"' in metrics
@@ -0,0 +1,58 @@
+import os
+from collections import Counter
+
+from core.config import settings
+from core.profiler import Profiler, Session
+
+
+def outer():
+    pass
+
+
+def inner():
+    pass
+
+
+def test_should_profile(tmp_path):
+    profiler = Profiler(str(tmp_path), 0, "secret")
+    assert profiler.should_profile("secret")
+    assert not profiler.should_profile("secre")
+    assert not profiler.should_profile(None)
+
+    profiler.next_requests = 2
+    assert profiler.should_profile(None)
+    assert profiler.should_profile(None)
+    assert not profiler.should_profile(None)
+
+    profiler.sample_rate = 1
+    assert profiler.should_profile(None)
+    assert not Profiler(str(tmp_path), 0, None).should_profile("")
+
+
+def test_write_keeps_the_most_frequent_stacks(monkeypatch, tmp_path):
+    profiler = Profiler(str(tmp_path), 0, None)
+    session = profiler.session("GET", "/api/v1/users")
+    session.stacks = Counter(
+        {(inner.__code__, outer.__code__): 5, (outer.__code__,): 2}
+    )
+    profiler.write(session)
+    with open(tmp_path / session.name) as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 2
+    assert lines[0].startswith("outer (") and ";inner (" in lines[0]
+    assert lines[0].endswith(" 5")
+
+    monkeypatch.setattr(settings, "PROFILER_MAX_FILE_BYTES", len(lines[0]) + 1)
+    profiler.write(session)
+    with open(tmp_path / session.name) as file:
+        assert file.read().splitlines() == lines[:1]
+
+
+def test_prune_drops_the_oldest_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILER_MAX_FILES", 2)
+    profiler = Profiler(str(tmp_path), 0, None)
+    for stamp in ("1", "2", "3"):
+        profiler.write(Session(f"{stamp}-get-root.folded"))
+    (tmp_path / "notes.txt").write_text("kept")
+    assert profiler.files() == ["2-get-root.folded", "3-get-root.folded"]
+    assert os.path.exists(tmp_path / "notes.txt")
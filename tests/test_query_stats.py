@@ -0,0 +1,83 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from core.middleware import QueryStatsMiddleware
+from db.query_stats import fingerprint, track_queries
+
+
+@pytest.fixture
+def stats_client(database):
+    """An app whose route runs `select :n` for each n of its query string."""
+    engine = create_engine(database.url)
+    track_queries(engine)
+
+    def build(**options):
+        app = FastAPI()
+
+        @app.get("/")
+        def run(n: str = ""):
+            with engine.connect() as connection:
+                for value in filter(None, n.split(",")):
+                    connection.execute(text("SELECT :n"), {"n": int(value)})
+            return {}
+
+        app.add_middleware(QueryStatsMiddleware, **options)
+        return TestClient(app)
+
+    yield build
+    engine.dispose()
+
+
+def test_fingerprint():
+    assert fingerprint("SELECT * FROM t WHERE id = %(id_1)s::UUID") == (
+        "SELECT * FROM t WHERE id = ?"
+    )
+    assert fingerprint("SELECT 1 WHERE id IN (%(a)s, %(b)s,\n %(c)s)") == (
+        fingerprint("SELECT 1 WHERE id IN (%(a)s)")
+    )
+    assert fingerprint("INSERT INTO t VALUES ($1, $2), ($3, $4)") == (
+        fingerprint("INSERT INTO t VALUES ($1, $2)")
+    )
+
+
+def test_server_timing(stats_client):
+    response = stats_client().get("/?n=1,2")
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert response.headers["server-timing"].endswith('desc="2 queries"')
+
+
+def test_budget(stats_client, caplog):
+    client = stats_client(budget=2, enforce=True)
+    assert client.get("/?n=1,2").status_code == 200
+    response = client.get("/?n=1,2,3")
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Query budget exceeded: 3 > 2"}
+    assert 'desc="3 queries"' in response.headers["server-timing"]
+
+    with caplog.at_level(logging.ERROR, "core.middleware"):
+        response = stats_client(budget=2).get("/?n=1,2,3")
+    assert response.status_code == 200
+    assert "over the budget of 2" in caplog.text
+
+
+def test_repeated_statements_are_logged(stats_client, caplog):
+    client = stats_client(repeat_threshold=3)
+    with caplog.at_level(logging.WARNING, "core.middleware"):
+        client.get("/?n=1,2")
+    assert "possible N+1" not in caplog.text
+    with caplog.at_level(logging.WARNING, "core.middleware"):
+        client.get("/?n=1,2,3")
+    (record,) = [it for it in caplog.records if "possible N+1" in it.message]
+    assert record.repeated_count == 3
+    assert record.statement == "SELECT ?"
+
+
+def test_app_requests_report_their_queries(client):
+    response = client.get("/api/v1/users?limit=1")
+    assert response.status_code == 200
+    assert "queries" in response.headers["server-timing"]
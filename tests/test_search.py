@@ -0,0 +1,78 @@
+import uuid
+
+import pytest
+
+from core.config import settings
+
+
+def create_tweets(client, headers, content: str, count: int) -> list:
+    ids = []
+    for _ in range(count):
+        response = client.post(
+            "/api/v1/tweets", json={"content": content}, headers=headers
+        )
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+
+def search_pages(client, q: str, limit: int):
+    pages, cursor = [], None
+    while True:
+        params = {"q": q, "limit": limit}
+        if cursor:
+            params["before"] = cursor
+        response = client.get("/api/v1/tweets/search", params=params)
+        assert response.status_code == 200, response.text
+        pages.append(
+            (response.headers["x-search-match"], [it["id"] for it in response.json()])
+        )
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return pages
+
+
+def unique_word() -> str:
+    return "".join(chr(ord("a") + int(it, 16) % 26) for it in uuid.uuid4().hex[:12])
+
+
+# the 3 newest tweets do not match: 2 ranks none and fetches the older
+# matches through the GIN index, 4 ranks one and walks on, 1000 ranks 3
+@pytest.mark.parametrize("scan_rows", [2, 4, 1000])
+def test_pages_past_the_ranked_candidates(client, signup, monkeypatch, scan_rows):
+    monkeypatch.setattr(settings, "SEARCH_MAX_CANDIDATES", 3)
+    monkeypatch.setattr(settings, "SEARCH_SCAN_ROWS", scan_rows)
+    _, _, headers = signup()
+    word = unique_word()
+    ids = create_tweets(client, headers, f"{word} tweet", 7)
+    create_tweets(client, headers, f"{unique_word()} tweet", 3)
+
+    pages = search_pages(client, word, 2)
+    found = [it for _, page in pages for it in page]
+    assert sorted(found) == sorted(ids)
+    assert {match for match, _ in pages} == {"words"}
+    # the ranked ones come first, the older ones follow newest first
+    assert set(found[:3]) == set(ids[-3:])
+    assert found[3:] == ids[-4::-1]
+
+
+def test_all_matches_ranked_under_the_cap(client, signup):
+    _, _, headers = signup()
+    word = unique_word()
+    ids = create_tweets(client, headers, f"{word} tweet", 3)
+    pages = search_pages(client, word, 2)
+    assert sorted(it for _, page in pages for it in page) == sorted(ids)
+
+
+def test_substring_fallback(client, signup):
+    _, _, headers = signup()
+    word = unique_word()
+    ids = create_tweets(client, headers, f"{word} tweet", 3)
+    pages = search_pages(client, word[2:9], 2)
+    assert {match for match, _ in pages} == {"substring"}
+    assert [it for _, page in pages for it in page] == ids[::-1]
+
+
+def test_invalid_cursor(client):
+    params = {"q": "tweet", "before": "nope"}
+    assert client.get("/api/v1/tweets/search", params=params).status_code == 400
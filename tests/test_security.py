@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import pytest
+from jose import ExpiredSignatureError, jwt
+
+from apis.v1.route_auth import get_current_user_from_token
+from core.config import settings
+from core.security import create_access_token, decode_access_token, token_cache
+from db.models.users import User
+from db.query_stats import QueryStats, current_stats
+from db.repository.tokens import revocations
+from db.repository.users import invalidate_principal
+from tests.conftest import login
+
+
+def test_cached_token_expires():
+    token = create_access_token({"sub": "someone@example.com"}, timedelta(seconds=-1))
+    payload = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM],
+        options={"verify_exp": False},
+    )
+    # cached longer than the token lives
+    token_cache.set(token, payload, ttl=60)
+    with pytest.raises(ExpiredSignatureError):
+        decode_access_token(token)
+
+
+def test_expired_token_is_refused(client):
+    token = create_access_token({"sub": "someone@example.com"}, timedelta(seconds=-1))
+    response = client.get(
+        "/api/v1/users/me", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 401
+
+
+@pytest.fixture
+def stateless(monkeypatch, db):
+    monkeypatch.setattr(settings, "JWT_STATELESS_PRINCIPAL", True)
+    revocations.sync(db)
+    monkeypatch.setattr(revocations, "sync_seconds", 3600)
+
+
+def test_stateless_principal_skips_the_user_row(client, signup, db, stateless):
+    user_id, email, _ = signup()
+    token = login(client, email).json()["access_token"]
+    invalidate_principal(email)
+
+    stats = QueryStats()
+    reset = current_stats.set(stats)
+    try:
+        user = get_current_user_from_token(token, db)
+        assert (str(user.id), user.is_active, user.is_superuser) == (
+            user_id,
+            True,
+            False,
+        )
+    finally:
+        current_stats.reset(reset)
+    assert stats.count == 0
+
+
+def test_stateless_claims_decide_admin_routes(
+    client, signup, db, stateless, monkeypatch
+):
+    monkeypatch.setattr(settings, "PROFILER", False)
+    user_id, email, _ = signup()
+    token = login(client, email).json()["access_token"]
+    db.query(User).filter(User.id == user_id).update({User.is_superuser: True})
+    db.commit()
+    invalidate_principal(email)
+
+    # the claims say not a superuser until a new token is issued
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/v1/profiler", headers=headers).status_code == 403
+    assert client.get("/api/v1/exports/users", headers=headers).status_code == 403
+
+    token = login(client, email).json()["access_token"]
+    response = client.get(
+        "/api/v1/profiler", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Profiler is disabled"
@@ -0,0 +1,51 @@
+from uuid import UUID
+
+import pytest
+
+from db.repository import trending as trending_module
+from db.repository.trending import TrendingTweets
+from db.repository.tweets import like_tweets
+
+
+@pytest.fixture
+def trending(monkeypatch):
+    trending = TrendingTweets(10, 1.8, 48, 60)
+    monkeypatch.setattr(trending_module, "trending", trending)
+    return trending
+
+
+def create_tweet(client, headers) -> UUID:
+    response = client.post("/api/v1/tweets", json={"content": "hi"}, headers=headers)
+    assert response.status_code == 201, response.text
+    return UUID(response.json()["id"])
+
+
+def test_observes_committed_likes_only(client, signup, db, trending):
+    user_id, _, headers = signup()
+    tweet_id = create_tweet(client, headers)
+
+    assert like_tweets(db, UUID(user_id), [tweet_id]) == [tweet_id]
+    assert tweet_id not in trending.candidates
+    db.rollback()
+    assert tweet_id not in trending.candidates
+
+    like_tweets(db, UUID(user_id), [tweet_id])
+    db.commit()
+    assert trending.candidates[tweet_id][0] == 1
+
+
+def test_observes_route_likes(client, signup, trending):
+    _, _, headers = signup()
+    tweet_id = create_tweet(client, headers)
+    response = client.post(f"/api/v1/tweets/{tweet_id}/like", headers=headers)
+    assert response.status_code == 204
+    assert trending.candidates[tweet_id][0] == 1
+
+
+def test_trending_sends_etag_only(client, signup, trending):
+    url = "/api/v1/tweets/trending?limit=5"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,162 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+from starlette.requests import Request
+
+from core.write_behind import WriteBehindQueue
+
+KEY = ("user", "tweet")
+
+
+class Recorder:
+    """apply callback keeping the batches, failing the first `fail` calls."""
+
+    def __init__(self, fail: int = 0):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, batch: dict):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("database is down")
+        self.batches.append(dict(batch))
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make_queue(apply, **options):
+        options.setdefault("interval", 60)
+        queue = WriteBehindQueue("likes", apply, max_pending=100, **options)
+        queues.append(queue)
+        return queue
+
+    yield make_queue
+    for queue in queues:
+        queue.stop()
+
+
+def test_last_value_wins(make_queue):
+    applied = Recorder()
+    queue = make_queue(applied)
+    queue.put(KEY, True, "a")
+    queue.put(KEY, False, "a")
+    queue.put(KEY, True, "a")
+    assert queue.flush()
+    assert applied.batches == [{KEY: True}]
+
+
+def test_like_then_unlike_collapses(make_queue):
+    applied = Recorder()
+    queue = make_queue(applied)
+    queue.put(KEY, True, "a", stored=False)
+    queue.put(KEY, False, "a", stored=False)
+    assert not queue.pending
+    assert queue.flush()
+    assert applied.batches == []
+
+
+def test_failed_flush_requeues(make_queue):
+    applied = Recorder(fail=1)
+    queue = make_queue(applied)
+    queue.put(KEY, True, "a")
+    queue.put(("user", "other"), True, "b")
+    assert not queue.flush()
+    assert queue.pending == {KEY: True, ("user", "other"): True}
+    assert queue.has_pending()
+
+    queue.put(KEY, False, "a")  # newer than the failed batch
+    assert queue.flush()
+    assert applied.batches == [{KEY: False, ("user", "other"): True}]
+    assert queue.stats() == {"pending": 0, "flushed": 2, "failures": 1, "dropped": 0}
+    assert not queue.has_pending()
+
+
+def test_drops_after_max_attempts(make_queue, tmp_path):
+    applied = Recorder(fail=100)
+    queue = make_queue(applied, max_attempts=3, journal_dir=str(tmp_path))
+    queue.put(KEY, True, "a")
+    for _ in range(3):
+        assert not queue.flush()
+    assert not queue.pending
+    assert not queue.has_pending()
+    assert queue.stats()["dropped"] == 1
+    with open(tmp_path / "likes.dead") as file:
+        assert [json.loads(line) for line in file] == [[list(KEY), True]]
+
+
+def test_wait_for_does_not_wait_while_failing(make_queue):
+    queue = make_queue(Recorder(fail=100), wait_timeout=5)
+    queue.put(KEY, True, "a")
+    assert not queue.flush()
+    started = time.monotonic()
+    assert not queue.wait_for("a")
+    assert time.monotonic() - started < 1
+
+
+def test_replay_after_crash(make_queue, tmp_path):
+    crash = textwrap.dedent(f"""
+        import os
+        from core.write_behind import WriteBehindQueue
+
+        queue = WriteBehindQueue(
+            "likes", print, interval=60, max_pending=100, journal_dir={str(tmp_path)!r}
+        )
+        queue.put(("user", "tweet"), True, "a")
+        queue.put(("user", "tweet"), False, "a")
+        queue.put(("user", "other"), True, "a")
+        os._exit(1)
+        """)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", crash], cwd=root, check=False)
+    (journal,) = tmp_path.glob("*.journal")
+    with open(journal, "a") as file:
+        file.write('[["user", "torn"')  # the write the crash cut short
+
+    applied = Recorder()
+    queue = make_queue(applied, journal_dir=str(tmp_path))
+    queue.start()
+    assert queue.pending == {KEY: False, ("user", "other"): True}
+    assert not journal.exists()
+    queue.stop()
+    assert applied.batches == [{KEY: False, ("user", "other"): True}]
+    assert not list(tmp_path.glob("*.journal"))
+
+
+def test_journal_of_live_process_is_not_replayed(make_queue, tmp_path):
+    first = make_queue(Recorder(), journal_dir=str(tmp_path))
+    first.put(KEY, True, "a")
+    second = make_queue(Recorder(), journal_dir=str(tmp_path))
+    second.start()
+    assert not second.pending
+    assert first.pending == {KEY: True}
+
+
+def request_with_token(subject: str) -> Request:
+    from core.security import create_access_token
+
+    token = create_access_token(data={"sub": subject})
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    return Request({"type": "http", "headers": headers})
+
+
+def test_wait_for_own_likes(make_queue, monkeypatch):
+    from apis.v1 import route_auth
+
+    applied = Recorder()
+    queue = make_queue(applied, wait_timeout=5)
+    monkeypatch.setattr(route_auth, "likes_queue", queue)
+    queue.put(KEY, True, "a@example.com")
+
+    route_auth.wait_for_own_likes(request_with_token("b@example.com"))
+    assert applied.batches == []
+
+    route_auth.wait_for_own_likes(request_with_token("A@example.com"))
+    assert applied.batches == [{KEY: True}]
+    assert not queue.has_pending()